@@ -18,10 +18,12 @@
 
 # Data
         "data/send_marks_mail.xml",
+        "data/ir_cron.xml",
 
         # Core Models
         "views/view_admission.xml",
         "views/bulk_admission.xml",
+        "views/bulk_admission_import.xml",
         "views/View_student.xml",
         "views/view_parent.xml",
         "views/view_teachers.xml",
@@ -11,6 +11,7 @@ from . import galleryimage
 from . import managealumini
 from . import admission
 from . import bulk_admission
+from . import bulk_admission_import
 from . import student_lines
 from . import academic_class
 from . import academic_room
@@ -1,5 +1,6 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, Command
 from odoo.exceptions import UserError
+from odoo.tools import SQL
 
 
 from datetime import date
@@ -53,26 +54,66 @@ class Admission(models.Model):
             }
         }
 
-    @api.model
-    def create(self, vals):
-        admission = super().create(vals)
-
-        self.env['school.student'].create({
-            'name': admission.student,
-            'email': admission.student_email,
-            'password': admission.student_password,
-            'parent_id': admission.parent.id if admission.parent else False,
-            'student_class_number1': admission.student_class_number1.id,
-            'section': admission.student_section_ABC,
-            'dob': admission.student_dob,
-            'gender': admission.student_gender,
-            'blood_group': admission.student_blood_group,
-            'address': admission.student_address,
-            'mobile_number': admission.student_number,
-            'image': admission.student_image,
-        })
-
-        return admission
+    def _prepare_student_values(self):
+        self.ensure_one()
+        return {
+            'name': self.student,
+            'email': self.student_email,
+            'password': self.student_password,
+            'student_class_number1': self.student_class_number1.id,
+            'section': self.student_section_ABC,
+            'dob': self.student_dob,
+            'gender': self.student_gender,
+            'blood_group': self.student_blood_group,
+            'address': self.student_address,
+            'mobile_number': self.student_number,
+        }
+
+    def _share_images(self, students):
+        """ Give ``students`` (mirroring ``self``, in the same order) the
+        image of their admission, as attachments referencing the same file of
+        the filestore: the image is neither read nor written again.
+
+        ``ir.attachment.create`` recomputes the storage columns from the
+        data, so the attachments are inserted directly.
+        """
+        if not students:
+            return
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO ir_attachment (name, res_model, res_field, res_id, company_id, type, public,
+                                       store_fname, db_datas, file_size, checksum, mimetype, index_content,
+                                       create_uid, create_date, write_uid, write_date)
+                 SELECT 'image', %(student_model)s, 'image', pair.student_id, image.company_id, image.type, image.public,
+                        image.store_fname, image.db_datas, image.file_size, image.checksum, image.mimetype,
+                        image.index_content, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                   FROM ir_attachment image
+                   JOIN unnest(%(admission_ids)s, %(student_ids)s) AS pair(admission_id, student_id)
+                     ON pair.admission_id = image.res_id
+                  WHERE image.res_model = %(admission_model)s AND image.res_field = 'student_image'
+            """,
+            student_model=students._name,
+            admission_model=self._name,
+            admission_ids=self.ids,
+            student_ids=students.ids,
+            uid=self.env.uid,
+        ))
+        students.invalidate_recordset(['image'])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        admissions = super().create(vals_list)
+        students = self.env['school.student'].create([admission._prepare_student_values() for admission in admissions])
+        admissions._share_images(students)
+
+        students_per_parent = {}
+        for admission, student in zip(admissions, students):
+            if admission.parent:
+                students_per_parent.setdefault(admission.parent, []).append(student.id)
+        for parent, student_ids in students_per_parent.items():
+            parent.student = [Command.link(student_id) for student_id in student_ids]
+
+        return admissions
 
     @api.constrains('student_email')
     def _check_email(self):
@@ -1,4 +1,8 @@
 from odoo import models, fields, api
+from odoo.tools import SQL, split_every
+
+# students created per create() call, and savepoint
+ADMISSION_BATCH_SIZE = 1000
 
 
 class BulkStudentAdmission(models.Model):
@@ -11,28 +15,131 @@ class BulkStudentAdmission(models.Model):
    admission_line_ids = fields.One2many('bulk.student.admission.line', 'admission_id', string='Students')
 
 
-   def action_confirm_bulk_admission(self):
+   def _validate_lines(self, lines):
+       """ Check ``lines`` as a whole, with one query per kind of reference,
+       and return ``{line: error message}`` for the lines that can't be
+       admitted.
+       """
+       errors = {}
+       emails = [line.email.strip().lower() for line in lines if line.email]
+       existing_emails = set()
+       if emails:
+           # matched case insensitively, the students' emails are stored as typed
+           Student = self.env['school.student']
+           Student.flush_model(['email'])
+           self.env.cr.execute(SQL(
+               "SELECT LOWER(TRIM(email)) FROM %s WHERE LOWER(TRIM(email)) = ANY(%s)",
+               SQL.identifier(Student._table), emails,
+           ))
+           existing_emails = {email for email, in self.env.cr.fetchall()}
+       classes = lines.student_class_number1.exists()
+       parents = lines.parent_ids.exists()
+       seen_emails = set()
+       for line in lines:
+           email = line.email.strip().lower() if line.email else False
+           if not (line.student_name or line.names.name):
+               errors[line] = "The student name is missing."
+           elif not email:
+               errors[line] = "The email is missing."
+           elif not email.endswith('@gmail.com'):
+               errors[line] = "Enter a valid email.The email must end with '@gmail.com'."
+           elif email in existing_emails:
+               errors[line] = "A student with this email already exists."
+           elif email in seen_emails:
+               errors[line] = "This email is used by another line of the admission."
+           elif line.student_class_number1 not in classes:
+               errors[line] = "The class is missing."
+           elif not line.section:
+               errors[line] = "The section is missing."
+           elif line.student_class_number1.section and line.student_class_number1.section != line.section:
+               errors[line] = "Section %s is not a section of class %s." % (
+                   line.section, line.student_class_number1.display_name)
+           elif line.parent_ids and line.parent_ids not in parents:
+               errors[line] = "The parent no longer exists."
+           seen_emails.add(email)
+       return errors
+
+   def _create_students(self, lines):
+       """ Create the students of ``lines`` with one ``create`` per chunk,
+       retrying a failed chunk line by line so that a faulty line doesn't
+       fail the others. Return ``({line: student id}, {line: error})``.
+       """
        student_model = self.env['school.student']
-       # student_vals_list = []
-       for admission in self:
-           for line in admission.admission_line_ids:
-               student_model.create({
-                   'name': line.name.name,
-                   'student_class_number1': line.student_class_number1.id,
-                   'section': line.section,
-                   'email': line.email,
-                   'password': line.password,
-                   'gender': line.gender,
-                   'parent_id': line.parent_id.id,
-               })
-           self.unlink()
+       students, errors = {}, {}
+       for line_ids in split_every(ADMISSION_BATCH_SIZE, lines.ids):
+           chunk = lines.browse(line_ids)
+           vals_list = [line._prepare_student_values() for line in chunk]
+           try:
+               with self.env.cr.savepoint():
+                   students.update(zip(chunk, student_model.create(vals_list).ids))
+               continue
+           except Exception:
+               # find out the faulty lines below
+               pass
+           for line, vals in zip(chunk, vals_list):
+               try:
+                   with self.env.cr.savepoint():
+                       students[line] = student_model.create(vals).id
+               except Exception as e:
+                   errors[line] = str(e)
+       return students, errors
+
+   def _link_parents(self, students):
+       """ Add the students of ``students`` (``{line: student id}``) to their
+       parents with a single insert into the relation table.
+       """
+       rows = [(line.parent_ids.id, student_id) for line, student_id in students.items() if line.parent_ids]
+       if not rows:
+           return
+       field = self.env['users.parents']._fields['student']
+       self.env.cr.execute(SQL(
+           "INSERT INTO %s (%s, %s) VALUES %s ON CONFLICT DO NOTHING",
+           SQL.identifier(field.relation),
+           SQL.identifier(field.column1),
+           SQL.identifier(field.column2),
+           SQL(", ").join(SQL("(%s, %s)", parent_id, student_id) for parent_id, student_id in rows),
+       ))
+       self.env['users.parents'].invalidate_model(['student'])
+
+   def action_confirm_bulk_admission(self):
+       lines = self.admission_line_ids.filtered(lambda line: line.state != 'done')
+       errors = self._validate_lines(lines)
+       students, create_errors = self._create_students(lines.filtered(lambda line: line not in errors))
+       errors.update(create_errors)
+       self._link_parents(students)
+
+       # one write for the admitted lines, one per distinct error
+       self.env['bulk.student.admission.line'].concat(*students).write({'state': 'done', 'error': False})
+       lines_per_error = {}
+       for line, error in errors.items():
+           lines_per_error.setdefault(error, []).append(line.id)
+       for error, line_ids in lines_per_error.items():
+           self.env['bulk.student.admission.line'].browse(line_ids).write({'state': 'error', 'error': error})
+
+       # admissions are only discarded once all their students are admitted
+       self.filtered(lambda admission: all(line.state == 'done' for line in admission.admission_line_ids)).unlink()
+       return {
+           'type': 'ir.actions.client',
+           'tag': 'display_notification',
+           'params': {
+               'title': "Bulk Student Admission",
+               'message': "%s students admitted, %s lines in error." % (len(students), len(errors)),
+               'type': 'warning' if errors else 'success',
+               'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'} if self.exists() else {
+                   'type': 'ir.actions.act_window',
+                   'res_model': 'school.student',
+                   'views': [(False, 'list'), (False, 'form')],
+               },
+           },
+       }
 
 
 class BulkStudentAdmissionLine(models.Model):
     _name = 'bulk.student.admission.line'
     _description = 'Bulk Student Admission Line'
 
-    admission_id = fields.Many2one('bulk.student.admission', string='Admission Reference')
+    admission_id = fields.Many2one('bulk.student.admission', string='Admission Reference', ondelete='cascade',
+                                   index=True)
     student_class_number1 = fields.Many2one("academic.class", store=True, string="Standard")
 
     # class_number = fields.Selection([
@@ -51,7 +158,8 @@ class BulkStudentAdmissionLine(models.Model):
         ("A", "A"),
         ("B", "B"),
         ("C", "C")], "Section", tracking=True, )
-    names = fields.Many2one(comodel_name="school.student", string="Student Name", tracking=True)
+    student_name = fields.Char(string="Student Name")
+    names = fields.Many2one(comodel_name="school.student", string="Existing Student", tracking=True)
     email = fields.Char(string="Email")
     password = fields.Char(string="Password", password=True)
     gender = fields.Selection([
@@ -59,3 +167,20 @@ class BulkStudentAdmissionLine(models.Model):
         ('female', 'Female'),
     ], string="Gender")
     parent_ids = fields.Many2one(comodel_name="users.parents",string="Parent")
+    state = fields.Selection([
+        ('draft', 'To Admit'),
+        ('done', 'Admitted'),
+        ('error', 'Error'),
+    ], string="Status", default='draft', required=True)
+    error = fields.Char(string="Error", readonly=True)
+
+    def _prepare_student_values(self):
+        self.ensure_one()
+        return {
+            'name': self.student_name or self.names.name,
+            'student_class_number1': self.student_class_number1.id,
+            'section': self.section,
+            'email': self.email.strip(),
+            'password': self.password,
+            'gender': self.gender,
+        }
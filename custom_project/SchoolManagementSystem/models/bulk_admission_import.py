@@ -0,0 +1,248 @@
+import csv
+import io
+import logging
+import os
+from datetime import timedelta
+from itertools import islice
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# lines created per create() call and commit
+IMPORT_BATCH_SIZE = 2000
+
+# accepted column titles, lower case, per admission line field
+IMPORT_COLUMNS = {
+    'student_name': ('student name', 'student', 'name'),
+    'email': ('email', 'student email'),
+    'password': ('password',),
+    'gender': ('gender',),
+    'class': ('class', 'standard'),
+    'section': ('section',),
+    'parent': ('parent', 'parent email', 'parent name'),
+}
+
+
+class BulkStudentAdmissionImport(models.Model):
+    """ An import of an admission sheet into a bulk admission. It is a regular
+    model as an interrupted or failed import must survive until it is
+    resumed; the imports done are garbage collected.
+    """
+    _name = 'bulk.student.admission.import'
+    _description = 'Import Bulk Student Admission Sheet'
+
+    admission_id = fields.Many2one('bulk.student.admission', string="Bulk Admission", required=True,
+                                   ondelete='cascade')
+    file = fields.Binary(string="Admission Sheet", required=True, attachment=True)
+    file_name = fields.Char(string="File Name")
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('running', 'Importing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], default='draft')
+    row_count = fields.Integer(string="Rows", readonly=True)
+    processed_count = fields.Integer(string="Processed Rows", readonly=True)
+    imported_count = fields.Integer(string="Imported Rows", readonly=True)
+    progress = fields.Float(string="Progress", compute='_compute_progress')
+    error = fields.Char(string="Error", readonly=True)
+
+    @api.depends('row_count', 'processed_count')
+    def _compute_progress(self):
+        for wizard in self:
+            wizard.progress = 100.0 * wizard.processed_count / wizard.row_count if wizard.row_count else 0.0
+
+    def write(self, vals):
+        if 'file' in vals:
+            # a new sheet is imported from its first row
+            vals = dict(vals, processed_count=0, imported_count=0)
+        return super().write(vals)
+
+    @api.autovacuum
+    def _gc_imports(self):
+        """ Delete the imports done, and the drafts left, along with their
+        sheet, a day after their last change.
+        """
+        self.search([
+            ('state', 'in', ('draft', 'done')),
+            ('write_date', '<', fields.Datetime.now() - timedelta(days=1)),
+        ]).unlink()
+
+    def _open_file(self):
+        """ Return a binary file object on the uploaded sheet, read from the
+        filestore rather than loaded in memory.
+        """
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('res_field', '=', 'file'),
+        ], limit=1)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(attachment.raw or b'')
+
+    def _read_rows(self, file):
+        """ Yield ``(row count, header)`` then every row of the sheet, as
+        tuples of strings, without ever holding the whole sheet in memory.
+        """
+        extension = os.path.splitext(self.file_name or '')[1].lower()
+        if extension == '.xlsx':
+            if openpyxl is None:
+                raise UserError("The openpyxl library is required to import XLSX files.")
+            workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+            try:
+                sheet = workbook.worksheets[0]
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, ())
+                yield (sheet.max_row or 1) - 1, header
+                for row in rows:
+                    yield tuple('' if value is None else str(value) for value in row)
+            finally:
+                workbook.close()
+        elif extension == '.csv':
+            # a first pass to count the rows for the progress, parsed as the
+            # fields of a row may span several lines
+            text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+            row_count = sum(1 for _row in csv.reader(text)) - 1
+            text.detach()
+            file.seek(0)
+            reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+            yield row_count, next(reader, ())
+            yield from reader
+        else:
+            raise UserError("Only CSV and XLSX admission sheets can be imported.")
+
+    def _get_column_indexes(self, header):
+        titles = [str(title or '').strip().lower() for title in header]
+        indexes = {}
+        for key, accepted in IMPORT_COLUMNS.items():
+            indexes[key] = next((titles.index(title) for title in accepted if title in titles), None)
+        if indexes['student_name'] is None or indexes['email'] is None:
+            raise UserError("The sheet needs at least a student name and an email column.")
+        return indexes
+
+    def _get_lookups(self):
+        """ Preload ``({(class, section): class id}, {parent key: parent id})``
+        so that resolving the rows doesn't query the database.
+        """
+        classes = {}
+        for academic_class in self.env['academic.class'].search_fetch([], ['class_names', 'section'], order='id'):
+            name = (academic_class.class_names or '').upper()
+            classes.setdefault((name, academic_class.section), academic_class.id)
+            classes.setdefault((name, False), academic_class.id)
+        parents = {}
+        for parent in self.env['users.parents'].search_fetch([], ['parent_name', 'email'], order='id'):
+            for key in (parent.email, parent.parent_name):
+                if key:
+                    parents.setdefault(key.strip().lower(), parent.id)
+        return classes, parents
+
+    def _prepare_line_values(self, row, indexes, classes, parents):
+        def cell(key):
+            index = indexes[key]
+            return row[index].strip() if index is not None and index < len(row) and row[index] else ''
+
+        section = cell('section').upper() or False
+        class_name = cell('class').upper()
+        parent_key = cell('parent').lower()
+        gender = cell('gender').lower()
+        errors = []
+        class_id = classes.get((class_name, section)) or classes.get((class_name, False))
+        if class_name and not class_id:
+            errors.append("Unknown class %s." % class_name)
+        parent_id = parents.get(parent_key)
+        if parent_key and not parent_id:
+            errors.append("Unknown parent %s." % parent_key)
+        if section and section not in ('A', 'B', 'C'):
+            errors.append("Unknown section %s." % section)
+            section = False
+        if gender and gender not in ('male', 'female'):
+            errors.append("Unknown gender %s." % gender)
+            gender = False
+        return {
+            'admission_id': self.admission_id.id,
+            'student_name': cell('student_name'),
+            'email': cell('email'),
+            'password': cell('password'),
+            'gender': gender or False,
+            'student_class_number1': class_id or False,
+            'section': section,
+            'parent_ids': parent_id or False,
+            'state': 'error' if errors else 'draft',
+            'error': ' '.join(errors) or False,
+        }
+
+    def _action_reopen(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'name': "Import Admission Sheet",
+            'res_model': self._name,
+            'res_id': self.id,
+            'views': [(False, 'form')],
+            'target': 'new',
+        }
+
+    def action_import(self):
+        """ Check the sheet and queue its import, which runs in the background
+        so that its progress can be followed on the wizard.
+        """
+        self.ensure_one()
+        with self._open_file() as file:
+            rows = self._read_rows(file)
+            _row_count, header = next(rows)
+            self._get_column_indexes(header)
+            rows.close()
+        self.write({'state': 'running', 'error': False})
+        self.env.ref('SchoolManagementSystem.ir_cron_bulk_admission_import')._trigger()
+        return self._action_reopen()
+
+    def action_refresh(self):
+        return self._action_reopen()
+
+    def _run_import(self):
+        """ Import the sheet in batches, each one committed along with the
+        progress. A run interrupted midway resumes after the last batch
+        committed.
+        """
+        self.ensure_one()
+        Line = self.env['bulk.student.admission.line']
+        classes, parents = self._get_lookups()
+        with self._open_file() as file:
+            rows = self._read_rows(file)
+            row_count, header = next(rows)
+            indexes = self._get_column_indexes(header)
+            processed, imported = self.processed_count, self.imported_count
+            self.write({'row_count': row_count})
+            rows = islice(rows, processed, None)
+            while batch := list(islice(rows, IMPORT_BATCH_SIZE)):
+                Line.create([
+                    self._prepare_line_values(row, indexes, classes, parents)
+                    for row in batch if any(row)
+                ])
+                processed += len(batch)
+                imported += sum(1 for row in batch if any(row))
+                self.write({'processed_count': processed, 'imported_count': imported})
+                self.env.cr.commit()
+                # don't keep the created lines in the cache
+                self.env.invalidate_all()
+        self.write({'state': 'done', 'row_count': max(row_count, processed)})
+
+    @api.model
+    def _cron_import(self):
+        for wizard in self.search([('state', '=', 'running')]):
+            try:
+                wizard._run_import()
+                self.env.cr.commit()
+            except Exception as e:
+                # the committed batches are kept, the import can be resumed
+                self.env.cr.rollback()
+                _logger.warning("Import of admission sheet %s failed", wizard.id, exc_info=True)
+                wizard.write({'state': 'failed', 'error': str(e)})
+                self.env.cr.commit()
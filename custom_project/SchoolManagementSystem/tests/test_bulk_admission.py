@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from odoo.exceptions import ValidationError
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestBulkAdmission(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Student = cls.env['school.student']
+        cls.class_x = cls.env['academic.class'].create({'class_names': 'X', 'section': 'A'})
+        cls.parent = cls.env['users.parents'].create({'parent_name': 'Bulk Parent', 'email': 'bulk.parent@gmail.com'})
+        cls.Student.create({'name': 'Existing Student', 'email': 'Existing.Student@gmail.com'})
+
+    def _admission(self, *lines):
+        return self.env['bulk.student.admission'].create({
+            'admission_line_ids': [(0, 0, dict({
+                'student_class_number1': self.class_x.id,
+                'section': 'A',
+            }, **line)) for line in lines],
+        })
+
+    def test_admit_all(self):
+        admission = self._admission(
+            {'student_name': 'Student One', 'email': 'student.one@gmail.com', 'parent_ids': self.parent.id},
+            {'student_name': 'Student Two', 'email': 'student.two@gmail.com'},
+        )
+        admission.action_confirm_bulk_admission()
+        self.assertFalse(admission.exists(), "a fully admitted admission should be discarded")
+        students = self.Student.search([('email', 'in', ['student.one@gmail.com', 'student.two@gmail.com'])])
+        self.assertEqual(len(students), 2)
+        self.assertIn(students.filtered(lambda student: student.name == 'Student One'), self.parent.student)
+
+    def test_line_errors_are_isolated(self):
+        admission = self._admission(
+            {'student_name': 'Valid Student', 'email': 'valid.student@gmail.com'},
+            {'student_name': 'Bad Email', 'email': 'bad.email@example.com'},
+            {'student_name': 'Existing Again', 'email': 'existing.student@gmail.com'},
+            {'student_name': 'Twice One', 'email': 'twice@gmail.com'},
+            {'student_name': 'Twice Two', 'email': 'TWICE@gmail.com'},
+            {'student_name': 'Wrong Section', 'email': 'wrong.section@gmail.com', 'section': 'B'},
+            {'email': 'no.name@gmail.com'},
+        )
+        valid, bad_email, existing, twice_one, twice_two, wrong_section, no_name = admission.admission_line_ids
+        admission.action_confirm_bulk_admission()
+
+        self.assertTrue(admission.exists(), "an admission with lines in error should be kept")
+        self.assertEqual((valid | twice_one).mapped('state'), ['done', 'done'])
+        self.assertEqual(set((bad_email | existing | twice_two | wrong_section | no_name).mapped('state')), {'error'})
+        self.assertIn("@gmail.com", bad_email.error)
+        self.assertEqual(existing.error, "A student with this email already exists.",
+                         "existing emails should be matched case insensitively")
+        self.assertEqual(twice_two.error, "This email is used by another line of the admission.")
+        self.assertEqual(no_name.error, "The student name is missing.")
+        self.assertEqual(self.Student.search_count([('email', '=', 'valid.student@gmail.com')]), 1)
+
+        # fixing a line and confirming again only admits the remaining lines
+        bad_email.email = 'bad.email@gmail.com'
+        admission.action_confirm_bulk_admission()
+        self.assertEqual(bad_email.state, 'done')
+        self.assertEqual(self.Student.search_count([('email', '=', 'valid.student@gmail.com')]), 1)
+
+    def test_create_errors_are_isolated(self):
+        admission = self._admission(
+            {'student_name': 'Good Student', 'email': 'good.student@gmail.com'},
+            {'student_name': 'Faulty Student', 'email': 'faulty.student@gmail.com'},
+        )
+        good, faulty = admission.admission_line_ids
+        create = self.registry['school.student'].create
+
+        def create_student(model, vals_list):
+            if any(vals['name'] == 'Faulty Student' for vals in ([vals_list] if isinstance(vals_list, dict) else vals_list)):
+                raise ValidationError("Faulty student")
+            return create(model, vals_list)
+
+        with patch.object(self.registry['school.student'], 'create', autospec=True, side_effect=create_student):
+            admission.action_confirm_bulk_admission()
+
+        self.assertEqual(good.state, 'done', "a faulty line should not fail the others of its chunk")
+        self.assertRecordValues(faulty, [{'state': 'error', 'error': "Faulty student"}])
+        self.assertEqual(self.Student.search_count([('email', '=', 'good.student@gmail.com')]), 1)
+        self.assertFalse(self.Student.search_count([('email', '=', 'faulty.student@gmail.com')]))
@@ -1,7 +1,7 @@
 {
     "name": "Delivery Management",
     "author": "Durga",
-    "version": "18.0",
+    "version": "18.0.18.2",
     "license": "LGPL-3",
     "depends": ['base', 'account', ],
 
@@ -15,10 +15,15 @@
         [
             "security/ir.model.access.csv",
             "security/security.xml",
+            "data/ir_cron.xml",
             "wizard/assign_delivery_wizard.xml",
+            "wizard/delivery_collect_wizard.xml",
             "views/delivery_assigned.xml",
             "views/delivery_boy.xml",
             "views/delivery_invoices.xml",
+            "views/delivery_sync_job.xml",
+            "views/delivery_collection.xml",
+            "views/delivery_performance_report.xml",
             "views/menu.xml",
         ]
 
@@ -0,0 +1,131 @@
+import csv
+import io
+import re
+import tempfile
+
+import xlsxwriter
+
+from odoo import api, http
+from odoo.http import content_disposition, request, Response
+from odoo.tools import SQL
+
+# rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 2000
+STREAM_CHUNK_SIZE = 64 * 1024
+
+MANIFEST_HEADER = [
+    "Delivery Boy", "Invoice Number", "Delivery Status", "Customer", "Mobile", "Address", "Zip", "City",
+    "Description", "Quantity", "Price Unit", "Amount", "Invoice Total", "Amount Due",
+]
+# states of the deliveries to be carried, exported by default
+MANIFEST_STATES = ('transit', 'onway')
+
+
+class DeliveryManifestController(http.Controller):
+
+    def _manifest_rows(self, registry, uid, context, delivery_boy_ids, states):
+        """ Yield the manifest rows of the deliveries of ``delivery_boy_ids``
+        in ``states``, ordered by delivery boy, with a server-side cursor so
+        that only :data:`FETCH_SIZE` rows are ever held in memory.
+
+        Runs on its own cursor, since the response is streamed after the
+        request's cursor is closed.
+        """
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            Delivery = env['delivery.management']
+            domain = [('delivery_state', 'in', states)]
+            if delivery_boy_ids:
+                domain.append(('delivery_boy', 'in', delivery_boy_ids))
+            cr.execute(SQL(
+                """
+                DECLARE delivery_manifest NO SCROLL CURSOR FOR
+                   SELECT boy.name, delivery.number, delivery.delivery_state, partner.name,
+                          address.mobile, address.street, address.zip, address.city,
+                          line.description, line.quantity, line.price_unit, line.price_subtotal,
+                          delivery.total, delivery.order_amount_due
+                     FROM %(delivery)s delivery
+                     JOIN %(boy)s boy ON boy.id = delivery.delivery_boy
+                LEFT JOIN %(line)s line ON line.delivery_id = delivery.id
+                LEFT JOIN %(address)s address ON address.id = delivery.address_id
+                LEFT JOIN res_partner partner ON partner.id = delivery.customer_name
+                    WHERE delivery.id IN %(ids)s
+                 ORDER BY boy.name, boy.id, delivery.id, line.id
+                """,
+                delivery=SQL.identifier(Delivery._table),
+                boy=SQL.identifier(env['delivery.boy']._table),
+                line=SQL.identifier(env['delivery.management.line']._table),
+                address=SQL.identifier(env['delivery.address']._table),
+                ids=Delivery._search(domain).subselect(),
+            ))
+            while True:
+                cr.execute(SQL("FETCH %s FROM delivery_manifest", FETCH_SIZE))
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                yield from rows
+
+    def _stream_csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(MANIFEST_HEADER)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= STREAM_CHUNK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+
+    def _stream_xlsx(self, rows):
+        # constant_memory flushes every row to disk once the next one starts,
+        # the workbook is then streamed from its temporary file
+        with tempfile.TemporaryFile() as output:
+            workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'in_memory': False})
+            bold = workbook.add_format({'bold': True})
+            sheet, current_boy, row_index, sheet_names = None, None, 0, set()
+            for row in rows:
+                if sheet is None or row[0] != current_boy:
+                    # one sheet per delivery boy, rows are ordered by delivery boy
+                    current_boy = row[0]
+                    name = re.sub(r'[\[\]:*?/\\]', ' ', current_boy or "Delivery Boy")[:25]
+                    if name.lower() in sheet_names:
+                        name = '%s %s' % (name, len(sheet_names))
+                    sheet_names.add(name.lower())
+                    sheet = workbook.add_worksheet(name)
+                    sheet.write_row(0, 0, MANIFEST_HEADER, bold)
+                    row_index = 0
+                row_index += 1
+                sheet.write_row(row_index, 0, row)
+            if sheet is None:
+                workbook.add_worksheet().write_row(0, 0, MANIFEST_HEADER, bold)
+            workbook.close()
+            output.seek(0)
+            while chunk := output.read(STREAM_CHUNK_SIZE):
+                yield chunk
+
+    @http.route('/delivery_management/manifest/<string:file_format>', type='http', auth='user', methods=['GET'])
+    def delivery_manifest(self, file_format, delivery_boy_ids=None, states=None, **kwargs):
+        """ Manifest of the deliveries and their lines, per delivery boy, as
+        a CSV or XLSX file streamed in constant memory.
+        """
+        if file_format not in ('csv', 'xlsx'):
+            return request.not_found()
+        request.env['delivery.management'].check_access('read')
+        try:
+            delivery_boy_ids = [int(boy_id) for boy_id in delivery_boy_ids.split(',')] if delivery_boy_ids else []
+        except ValueError:
+            return request.not_found()
+        states = states.split(',') if states else list(MANIFEST_STATES)
+
+        rows = self._manifest_rows(
+            request.env.registry, request.env.uid, dict(request.env.context), delivery_boy_ids, states)
+        if file_format == 'csv':
+            body, mimetype = self._stream_csv(rows), 'text/csv;charset=utf-8'
+        else:
+            body, mimetype = self._stream_xlsx(rows), \
+                'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return Response(body, headers=[
+            ('Content-Type', mimetype),
+            ('Content-Disposition', content_disposition('delivery_manifest.%s' % file_format)),
+        ], direct_passthrough=True)
@@ -0,0 +1,35 @@
+""" Link the existing deliveries to their invoice through move_id, which
+replaces the lookups of account.move by invoice number, and fill the now
+stored payment_state.
+"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    # deliveries created by the invoice synchronization are referenced by it
+    cr.execute("""
+        UPDATE delivery_management delivery
+           SET move_id = move.id
+          FROM account_move move
+         WHERE move.delivery_management = delivery.id
+           AND delivery.move_id IS NULL
+    """)
+    # the others can only be matched by number, within the same company
+    cr.execute("""
+        UPDATE delivery_management delivery
+           SET move_id = move.id
+          FROM account_move move
+         WHERE delivery.move_id IS NULL
+           AND delivery.number IS NOT NULL
+           AND move.name = delivery.number
+           AND move.move_type = 'out_invoice'
+           AND move.company_id = delivery.company_id
+    """)
+    cr.execute("""
+        UPDATE delivery_management delivery
+           SET payment_state = move.payment_state
+          FROM account_move move
+         WHERE delivery.move_id = move.id
+           AND delivery.payment_state IS DISTINCT FROM move.payment_state
+    """)
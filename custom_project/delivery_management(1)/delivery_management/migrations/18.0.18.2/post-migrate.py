@@ -0,0 +1,54 @@
+""" Move the address columns copied on every delivery to shared, deduplicated
+delivery.address snapshots, then drop the columns once every delivery
+having an address is linked to its snapshot.
+"""
+import logging
+
+from odoo import api, SUPERUSER_ID
+from odoo.tools import split_every
+
+# former delivery_management column: delivery.address field
+COLUMNS = {
+    'customer_mobile': 'mobile',
+    'customer_address': 'street',
+    'customer_address1': 'street2',
+    'customer_address2': 'zip',
+    'customer_address3': 'city',
+    'customer_address4': 'state_name',
+    'customer_address5': 'country_name',
+}
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    cr.execute(
+        "SELECT COUNT(*) FROM information_schema.columns "
+        "WHERE table_name = 'delivery_management' AND column_name IN %s",
+        [tuple(COLUMNS)],
+    )
+    if cr.fetchone()[0] != len(COLUMNS):
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Address = env['delivery.address']
+    cr.execute("SELECT id, %s FROM delivery_management WHERE address_id IS NULL" % ', '.join(COLUMNS))
+    for rows in split_every(5000, cr.fetchall()):
+        address_ids = Address._get_or_create([dict(zip(COLUMNS.values(), row[1:])) for row in rows])
+        cr.execute(
+            "UPDATE delivery_management SET address_id = link.address_id "
+            "FROM unnest(%s, %s) AS link(delivery_id, address_id) WHERE id = link.delivery_id",
+            [[row[0] for row in rows], address_ids],
+        )
+
+    cr.execute(
+        "SELECT COUNT(*) FROM delivery_management WHERE address_id IS NULL AND (%s)"
+        % ' OR '.join("COALESCE(%s, '') != ''" % column for column in COLUMNS)
+    )
+    [missing] = cr.fetchone()
+    if missing:
+        _logger.warning("%s deliveries could not be linked to their address, "
+                        "the former address columns are kept.", missing)
+        return
+    cr.execute("ALTER TABLE delivery_management %s" % ', '.join('DROP COLUMN %s' % column for column in COLUMNS))
@@ -1,3 +1,10 @@
 from . import delivery_invoices
 from . import delivery_boy
-from . import delivery_collection
\ No newline at end of file
+from . import delivery_collection
+from . import delivery_totals
+from . import delivery_sync_job
+from . import delivery_dispatch
+from . import delivery_state_log
+from . import delivery_address
+from . import res_company
+from . import delivery_performance_report
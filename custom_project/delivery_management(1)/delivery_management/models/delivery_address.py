@@ -0,0 +1,93 @@
+import hashlib
+import json
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+ADDRESS_FIELDS = ('mobile', 'street', 'street2', 'zip', 'city', 'state_name', 'country_name')
+
+
+class DeliveryAddress(models.Model):
+    _name = 'delivery.address'
+    _description = 'Delivery Address Snapshot'
+    _rec_name = 'street'
+    _log_access = False
+
+    address_hash = fields.Char(required=True)
+    mobile = fields.Char(string="Mobile Number")
+    street = fields.Char(string="Street")
+    street2 = fields.Char(string="Street 2")
+    zip = fields.Char(string="Zip")
+    city = fields.Char(string="City")
+    state_name = fields.Char(string="State")
+    country_name = fields.Char(string="Country")
+
+    _sql_constraints = [
+        ('address_hash_uniq', 'unique(address_hash)', "Delivery addresses are unique."),
+    ]
+
+    def init(self):
+        # deliveries are clustered and filtered on the upper cased columns,
+        # see CLUSTER_COLUMNS
+        for column in ('zip', 'city', 'state_name'):
+            tools.create_index(
+                self._cr, '%s_%s_upper_index' % (self._table, column), self._table,
+                ['UPPER(%s)' % column], where='%s IS NOT NULL' % column,
+            )
+
+    def write(self, vals):
+        # snapshots are shared by deliveries: an address change is a new snapshot
+        raise UserError("Delivery addresses cannot be modified.")
+
+    @api.model
+    def _normalize(self, values):
+        return {fname: (values.get(fname) or '').strip() for fname in ADDRESS_FIELDS}
+
+    @api.model
+    def _hash(self, values):
+        return hashlib.sha1(json.dumps([values[fname] for fname in ADDRESS_FIELDS]).encode()).hexdigest()
+
+    @api.model
+    def _get_or_create(self, values_list):
+        """ Return the ids of the snapshots of ``values_list`` (dicts of
+        :data:`ADDRESS_FIELDS`), in the same order, creating the missing ones
+        with a single insert.
+        """
+        if not values_list:
+            return []
+        values_list = [self._normalize(values) for values in values_list]
+        hashes = [self._hash(values) for values in values_list]
+        rows = {address_hash: values for address_hash, values in zip(hashes, values_list)}
+        columns = ('address_hash',) + ADDRESS_FIELDS
+        self.env.cr.execute(SQL(
+            "INSERT INTO %s (%s) VALUES %s ON CONFLICT (address_hash) DO NOTHING",
+            SQL.identifier(self._table),
+            SQL(", ").join(SQL.identifier(column) for column in columns),
+            SQL(", ").join(
+                SQL("(%s)", SQL(", ").join([address_hash] + [values[fname] or None for fname in ADDRESS_FIELDS]))
+                for address_hash, values in rows.items()
+            ),
+        ))
+        self.env.cr.execute(SQL(
+            "SELECT address_hash, id FROM %s WHERE address_hash = ANY(%s)",
+            SQL.identifier(self._table), list(rows),
+        ))
+        ids = dict(self.env.cr.fetchall())
+        return [ids[address_hash] for address_hash in hashes]
+
+    @api.model
+    def _get_for_partners(self, partners):
+        """ Return ``{partner id: snapshot id}`` of the current address of
+        ``partners``.
+        """
+        addresses = self._get_or_create([{
+            'mobile': partner.mobile,
+            'street': partner.street,
+            'street2': partner.street2,
+            'zip': partner.zip,
+            'city': partner.city,
+            'state_name': partner.state_id.name,
+            'country_name': partner.country_id.name,
+        } for partner in partners])
+        return dict(zip(partners.ids, addresses))
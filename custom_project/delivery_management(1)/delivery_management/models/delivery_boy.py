@@ -23,8 +23,10 @@ class DeliveryBoy(models.Model):
     is_delivery_boy = fields.Boolean(string="Is Delivery Boy", default=True)
     multi_companies = fields.Char("Multi Companies")
 
-    allowed_companies = fields.Char(string="Allowed Companies", compute='_compute_company_info', store=True)
-    default_companies = fields.Char(string="Default Company", compute='_compute_company_info', store=True)
+    company_ids = fields.Many2many('res.company', string="Companies",
+                                   help="Companies the delivery boy works for, all of them when empty")
+    allowed_companies = fields.Char(string="Allowed Companies", compute='_compute_company_info')
+    default_companies = fields.Char(string="Default Company", compute='_compute_company_info')
 
     usertype = fields.Char("User Type")
     user_type = fields.Selection([
@@ -54,15 +56,23 @@ class DeliveryBoy(models.Model):
     def dummy_method_rules(self):
         pass
 
-    @api.depends('name')
+    @api.depends('company_ids')
+    @api.depends_context('company')
     def _compute_company_info(self):
-        companies = self.env['res.company'].search([])
-        allowed = ', '.join(comp.name for comp in companies)
-        default = self.env.company.name
+        names = self.env['res.company']._get_company_names()
+        default = names.get(self.env.company.id, self.env.company.name)
         for rec in self:
-            rec.allowed_companies = allowed
+            rec.allowed_companies = ', '.join(names[company_id] for company_id in sorted(rec._allowed_company_ids()))
             rec.default_companies = default
 
+    def _allowed_company_ids(self):
+        """ Return the ids of the companies the delivery boy works for. """
+        self.ensure_one()
+        all_company_ids = self.env['res.company']._get_company_names().keys()
+        if not self.company_ids:
+            return frozenset(all_company_ids)
+        return frozenset(self.company_ids.ids).intersection(all_company_ids)
+
     @api.constrains('mobile')
     def _check_mobile_number(self):
         for record in self:
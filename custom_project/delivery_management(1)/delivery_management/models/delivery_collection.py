@@ -1,17 +1,202 @@
+import logging
+
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.tools import split_every
 from datetime import datetime
 
+_logger = logging.getLogger(__name__)
+
+# invoices paid per account.payment.register batch
+RECONCILE_BATCH_SIZE = 500
 
 
 class delivery_collection(models.Model):
     _name = 'delivery.collection'
     _description = 'Delivery Collection'
+    _order = 'date desc, id desc'
 
     delivery_id = fields.Many2one('delivery.management', string="Delivery Reference", required=True)
     amount_residual = fields.Monetary(string="Due Amount", currency_field='currency_id')
     currency_id = fields.Many2one('res.currency', default=lambda self: self.env.company.currency_id)
 
+    amount = fields.Monetary(string="Collected Amount", currency_field='currency_id', required=True)
+    date = fields.Date(string="Collection Date", default=fields.Date.context_today, index=True)
+    delivery_boy = fields.Many2one(related='delivery_id.delivery_boy', store=True, index=True)
+    move_id = fields.Many2one(related='delivery_id.move_id')
+    company_id = fields.Many2one(related='delivery_id.company_id', store=True)
+    state = fields.Selection([
+        ('collected', 'Collected'),
+        ('reconciled', 'Reconciled'),
+        ('discrepancy', 'Discrepancy'),
+        ('error', 'Error'),
+    ], string="Status", default='collected', required=True, index=True)
+    reconcile_error = fields.Char(string="Reconciliation Error", readonly=True)
+    payment_id = fields.Many2one('account.payment', string="Payment", readonly=True)
+    discrepancy = fields.Monetary(string="Discrepancy", currency_field='currency_id', readonly=True,
+                                  help="Collected amount minus the invoice residual at reconciliation")
+    discrepancy_reason = fields.Selection([
+        ('short', 'Short Collection'),
+        ('over', 'Over Collection'),
+        ('no_invoice', 'No Open Invoice'),
+    ], string="Discrepancy Reason", readonly=True)
+
+    @api.model
+    def _get_collection_journal(self, company):
+        journal_id = self.env['ir.config_parameter'].sudo().get_param('delivery_management.collection_journal_id')
+        journal = self.env['account.journal'].browse(int(journal_id)).exists() if journal_id else None
+        if journal and journal.company_id == company:
+            return journal
+        journal = self.env['account.journal'].search([
+            *self.env['account.journal']._check_company_domain(company),
+            ('type', '=', 'cash'),
+        ], limit=1)
+        if not journal:
+            raise UserError("No cash journal to register the delivery collections of %s." % company.name)
+        return journal
+
+    @api.model
+    def _register_payments(self, moves_amounts, journal, date):
+        """ Pay ``moves_amounts`` (``{move: amount}``, in the currency of the
+        invoice) through the payment register wizard, in batches. Invoices
+        paid in full share a single wizard per batch. A failing batch is
+        rolled back on its own, without failing the others.
+
+        :return: ``({move: payment}, {move: error message})``
+        """
+        full = [move for move, amount in moves_amounts.items()
+                if move.currency_id.compare_amounts(amount, move.amount_residual) == 0]
+        wizards = [
+            (self.env['account.move'].browse([move.id for move in batch]), {})
+            for batch in split_every(RECONCILE_BATCH_SIZE, full)
+        ] + [
+            # the wizard defaults to the currency of the journal
+            (move, {'amount': amount, 'currency_id': move.currency_id.id})
+            for move, amount in moves_amounts.items() if move not in full
+        ]
+        payments, errors = {}, {}
+        for moves, vals in wizards:
+            try:
+                with self.env.cr.savepoint():
+                    created = self.env['account.payment.register'].with_context(
+                        active_model='account.move', active_ids=moves.ids,
+                    ).create({
+                        'journal_id': journal.id,
+                        'payment_date': date,
+                        'group_payment': False,
+                        **vals,
+                    })._create_payments()
+            except Exception as e:
+                _logger.warning("Payment of the delivery collections of invoices %s failed", moves.ids, exc_info=True)
+                errors.update(dict.fromkeys(moves, str(e)))
+                continue
+            for payment in created:
+                for move in payment.reconciled_invoice_ids & moves:
+                    payments[move] = payment
+        return payments, errors
+
+    def action_reconcile(self):
+        """ Match the collected amounts of ``self`` against the residual of
+        their invoices and pay the invoices accordingly. Invoices collected
+        in full are paid in batches; short collections pay what was
+        collected, over collections pay the residual, and both are reported
+        as discrepancies along with the collections without open invoice.
+        Collected amounts are converted to the currency of their invoice
+        at the collection date. The collections whose payment fails are left
+        in error, and reconciled again by the next run.
+
+        :return: ``{'reconciled': n, 'discrepancies': n, 'errors': n,
+            'collected': total, 'paid': total}``
+        """
+        collections = self.filtered(lambda collection: collection.state in ('collected', 'error'))
+        # one pass to classify, on prefetched deliveries and invoices
+        to_pay = {}
+        results = {}
+        for collection in collections:
+            move = collection.move_id
+            if not move or move.state != 'posted' or move.currency_id.is_zero(move.amount_residual):
+                results[collection] = {'discrepancy_reason': 'no_invoice', 'discrepancy': collection.amount}
+                continue
+            # compared in the currency of the invoice
+            collected = collection.currency_id._convert(
+                collection.amount, move.currency_id, move.company_id, collection.date)
+            # an invoice collected twice is only paid once
+            remaining = move.amount_residual - to_pay.get(move, 0.0)
+            difference = move.currency_id.compare_amounts(collected, remaining)
+            if remaining > 0:
+                to_pay[move] = to_pay.get(move, 0.0) + min(collected, remaining)
+            reason = {-1: 'short', 1: 'over'}.get(difference)
+            results[collection] = {
+                'discrepancy_reason': reason,
+                'discrepancy': move.currency_id._convert(
+                    collected - remaining, collection.currency_id, move.company_id, collection.date,
+                ) if reason else 0.0,
+            }
+
+        # one pass per company to register the payments, a company failing
+        # as a whole (e.g. without cash journal) doesn't fail the others
+        payments, errors = {}, {}
+        for company in self.env['account.move'].union(*to_pay).company_id:
+            company_moves = {move: amount for move, amount in to_pay.items() if move.company_id == company}
+            try:
+                journal = self._get_collection_journal(company)
+            except UserError as e:
+                errors.update(dict.fromkeys(company_moves, str(e)))
+                continue
+            company_payments, company_errors = self._register_payments(
+                company_moves, journal, fields.Date.context_today(self))
+            payments.update(company_payments)
+            errors.update(company_errors)
+
+        # one write per outcome
+        groups = {}
+        for collection, values in results.items():
+            if collection.move_id in errors:
+                values = {'state': 'error', 'reconcile_error': errors[collection.move_id]}
+            else:
+                values = dict(values, payment_id=payments.get(collection.move_id, self.env['account.payment']).id)
+                values['state'] = 'discrepancy' if values['discrepancy_reason'] else 'reconciled'
+                values['reconcile_error'] = False
+            groups.setdefault(repr(sorted(values.items())), (values, []))[1].append(collection.id)
+        for values, ids in groups.values():
+            self.browse(ids).write(values)
+
+        states = [values['state'] for values, ids in groups.values() for _id in ids]
+        return {
+            'reconciled': states.count('reconciled'),
+            'discrepancies': states.count('discrepancy'),
+            'errors': states.count('error'),
+            'collected': sum(collections.mapped('amount')),
+            'paid': sum(amount for move, amount in to_pay.items() if move not in errors),
+        }
+
+    @api.model
+    def _cron_reconcile_collections(self):
+        """ End of day reconciliation of the collections of every delivery boy. """
+        collections = self.search([
+            ('state', 'in', ('collected', 'error')),
+            ('date', '<=', fields.Date.context_today(self)),
+        ])
+        collections.action_reconcile()
+
+    @api.model
+    def get_discrepancy_report(self, date_from=None, date_to=None):
+        """ Discrepancies per delivery boy and reason: ``[{'delivery_boy': id,
+        'discrepancy_reason': reason, 'count': n, 'discrepancy': amount}]``.
+        """
+        domain = [('state', '=', 'discrepancy')]
+        if date_from:
+            domain.append(('date', '>=', date_from))
+        if date_to:
+            domain.append(('date', '<=', date_to))
+        return [{
+            'delivery_boy': delivery_boy.id,
+            'discrepancy_reason': reason,
+            'count': count,
+            'discrepancy': discrepancy,
+        } for delivery_boy, reason, count, discrepancy in self._read_group(
+            domain, ['delivery_boy', 'discrepancy_reason'], ['__count', 'discrepancy:sum'])]
+
 
     # def action_collect_delivery(self):
     #     for record in self:
@@ -20,4 +205,4 @@ class delivery_collection(models.Model):
     #             if record.delivery_id:
     #                 record.delivery_id.delivery_state = 'collection'
     #         else:
-    #             raise UserError("Amount residual is zero; nothing to collect.")
\ No newline at end of file
+    #             raise UserError("Amount residual is zero; nothing to collect.")
@@ -0,0 +1,157 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from odoo import models, api
+from odoo.tools import SQL
+
+# default number of deliveries a delivery boy can carry per vehicle, see
+# the delivery_management.capacity_<vehicle> parameters
+VEHICLE_CAPACITY = {
+    'bike': 15,
+    'car': 40,
+    'truck': 120,
+}
+# delivery.address columns deliveries are clustered on, most precise first
+CLUSTER_COLUMNS = {
+    'zip': 'zip',
+    'city': 'city',
+    'state': 'state_name',
+}
+
+
+def pack_clusters(clusters, bins):
+    """ Bin-pack ``clusters`` onto ``bins`` with best-fit decreasing: the
+    largest clusters go first, each one to the bin with the least remaining
+    capacity still able to take it whole. A cluster that no bin can take
+    whole is split over the emptiest bins.
+
+    :param clusters: ``{key: [delivery ids]}``
+    :param bins: ``[(remaining capacity, cost, bin id)]``
+    :return: ``({bin id: [delivery ids]}, [delivery ids left over])``
+    """
+    bins = sorted(item for item in bins if item[0] > 0)
+    assignment = defaultdict(list)
+    left_over = []
+    for ids in sorted(clusters.values(), key=len, reverse=True):
+        ids = list(ids)
+        while ids and bins:
+            index = bisect_left(bins, (len(ids),))
+            if index == len(bins):
+                # too big for any bin: fill the emptiest one and go on
+                index = len(bins) - 1
+            remaining, cost, bin_id = bins.pop(index)
+            taken, ids = ids[:remaining], ids[remaining:]
+            assignment[bin_id] += taken
+            if remaining > len(taken):
+                insort(bins, (remaining - len(taken), cost, bin_id))
+        left_over += ids
+    return assignment, left_over
+
+
+class DeliveryOrder(models.Model):
+    _inherit = 'delivery.management'
+
+    @api.model
+    def _dispatch_clusters(self, domain):
+        """ Group the deliveries matching ``domain`` by company and address
+        with one query: ``{company id: {cluster key: [ids]}}``. Deliveries
+        fall back to the next, less precise, address column when the
+        configured one is empty.
+        """
+        cluster_by = self.env['ir.config_parameter'].sudo().get_param(
+            'delivery_management.dispatch_cluster_by', 'zip')
+        columns = list(CLUSTER_COLUMNS.values())
+        columns = columns[list(CLUSTER_COLUMNS).index(cluster_by):] if cluster_by in CLUSTER_COLUMNS else columns
+        key = SQL("COALESCE(%s, '')", SQL(", ").join(
+            SQL("NULLIF(UPPER(address.%s), '')", SQL.identifier(column)) for column in columns
+        ))
+        self.env.cr.execute(SQL(
+            """
+               SELECT delivery.id, delivery.company_id, %s
+                 FROM %s delivery
+            LEFT JOIN %s address ON address.id = delivery.address_id
+                WHERE delivery.id IN %s
+            """,
+            key,
+            SQL.identifier(self._table),
+            SQL.identifier(self.env['delivery.address']._table),
+            self._search(domain).subselect(),
+        ))
+        clusters = defaultdict(lambda: defaultdict(list))
+        for delivery_id, company_id, cluster in self.env.cr.fetchall():
+            clusters[company_id or False][cluster].append(delivery_id)
+        return clusters
+
+    @api.model
+    def _dispatch_bins(self):
+        """ Remaining capacity of the delivery boys having a vehicle, as
+        ``[(remaining capacity, commission fee, delivery boy id)]``.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        capacity = {
+            vehicle: int(get_param('delivery_management.capacity_%s' % vehicle, default))
+            for vehicle, default in VEHICLE_CAPACITY.items()
+        }
+        boys = self.env['delivery.boy'].search([('transportation', '!=', False), ('is_delivery_boy', '=', True)])
+        load = dict(self._read_group(
+            [('delivery_boy', 'in', boys.ids), ('delivery_state', 'in', ('transit', 'onway'))],
+            ['delivery_boy'], ['__count'],
+        ))
+        return [
+            (capacity.get(boy.transportation, 0) - load.get(boy, 0), boy.commission_fee, boy.id)
+            for boy in boys
+        ]
+
+    @api.model
+    def _dispatch_company_bins(self, bins, company_id, assignment):
+        """ The ``bins`` of the delivery boys working for ``company_id``
+        (all of them for deliveries without company), less what was
+        already assigned to them in ``assignment``.
+        """
+        boys = self.env['delivery.boy'].browse([bin_id for _remaining, _cost, bin_id in bins])
+        allowed = {
+            boy.id for boy in boys
+            if not company_id or company_id in boy._allowed_company_ids()
+        }
+        return [
+            (remaining - len(assignment.get(bin_id, ())), cost, bin_id)
+            for remaining, cost, bin_id in bins if bin_id in allowed
+        ]
+
+    def action_auto_dispatch(self):
+        """ Assign the draft deliveries of ``self`` (all draft deliveries
+        when empty) to the delivery boys, keeping the deliveries of a same
+        area together within the capacity of each vehicle.
+        """
+        domain = [('delivery_state', '=', 'draft'), ('delivery_boy', '=', False)]
+        if self:
+            domain.append(('id', 'in', self.ids))
+        clusters_per_company = self._dispatch_clusters(domain)
+        bins = self._dispatch_bins()
+        # deliveries only go to the delivery boys of their company, whose
+        # capacity is shared between the companies they work for
+        assignment, left_over = defaultdict(list), []
+        for company_id, clusters in clusters_per_company.items():
+            company_assignment, company_left_over = pack_clusters(
+                clusters, self._dispatch_company_bins(bins, company_id, assignment))
+            for boy_id, ids in company_assignment.items():
+                assignment[boy_id] += ids
+            left_over += company_left_over
+        for boy_id, ids in assignment.items():
+            self.browse(ids).write({'delivery_boy': boy_id})
+
+        assigned = sum(len(ids) for ids in assignment.values())
+        message = "%s deliveries in %s areas dispatched to %s delivery boys." % (
+            assigned, sum(len(clusters) for clusters in clusters_per_company.values()), len(assignment))
+        if left_over:
+            message += " %s deliveries exceed the available capacity and were left unassigned." % len(left_over)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': "Auto Dispatch",
+                'message': message,
+                'type': 'warning' if left_over else 'success',
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
@@ -1,14 +1,19 @@
 from odoo import models, fields, api
+from odoo.tools import SQL
+from collections import defaultdict
 from datetime import datetime
 from odoo.exceptions import UserError
 
+# fields feeding delivery.management.totals
+TOTALS_FIELDS = ('company_id', 'delivery_state', 'delivery_boy', 'tax_excluded', 'total')
 
 
 class DeliveryOrder(models.Model):
     _name = 'delivery.management'
     _description = 'Delivery Management'
 
-    number = fields.Char(string="Invoice Number")
+    number = fields.Char(string="Invoice Number", index=True)
+    move_id = fields.Many2one('account.move', string="Invoice", index='btree_not_null', ondelete='set null')
     due_date = fields.Char(string="Due Date")
     next_activity = fields.Char(string="Next Activity")
 
@@ -18,15 +23,18 @@ class DeliveryOrder(models.Model):
     order_amount_due = fields.Monetary(string="Order Amount Due", currency_field='currency_id')
 
     delivery_boy = fields.Many2one('delivery.boy', string="Delivery Boy")
+    company_id = fields.Many2one('res.company', string="Company", index=True,
+                                 default=lambda self: self.env.company)
 
     customer_name = fields.Many2one("res.partner", string="Customer Name")
-    customer_mobile = fields.Char(string="Mobile Number")
-    customer_address = fields.Text(string="Address")
-    customer_address1 = fields.Text(string=" ")
-    customer_address2 = fields.Text(string=" ")
-    customer_address3 = fields.Text(string=" ")
-    customer_address4 = fields.Text(string=" ")
-    customer_address5 = fields.Text(string=" ")
+    address_id = fields.Many2one('delivery.address', string="Delivery Address", index='btree_not_null')
+    customer_mobile = fields.Char(related='address_id.mobile', string="Mobile Number")
+    customer_address = fields.Char(related='address_id.street', string="Address")
+    customer_address1 = fields.Char(related='address_id.street2', string=" ")
+    customer_address2 = fields.Char(related='address_id.zip', string=" ")
+    customer_address3 = fields.Char(related='address_id.city', string=" ")
+    customer_address4 = fields.Char(related='address_id.state_name', string=" ")
+    customer_address5 = fields.Char(related='address_id.country_name', string=" ")
 
 
     currency_id = fields.Many2one(
@@ -52,12 +60,10 @@ class DeliveryOrder(models.Model):
         ('collection', 'Delivery Collection'),
         ('cancel_delivery', 'Cancel Delivery'),
     ], default='draft', string="Delivery Status")
+    # deliveries that are not on their way yet, and can be (re)assigned
+    ASSIGNABLE_STATES = ('draft', 'transit')
 
-    payment_state = fields.Selection([
-        ('not_paid', 'Not Paid'),
-        ('partial', 'Partial'),
-        ('paid', 'Paid'),
-    ], string="Payment State", compute="update_payment_state")
+    payment_state = fields.Selection(related='move_id.payment_state', string="Payment State", store=True)
 
     status = fields.Selection([
         ('draft', 'Draft'),
@@ -69,11 +75,35 @@ class DeliveryOrder(models.Model):
     amount_residual = fields.Monetary(string="Due Amount", currency_field='currency_id')
 
     def action_collect_delivery(self):
-        for record in self:
-            if record.amount_residual != 0:
-                record.delivery_state = 'collection'
-            else:
-                raise UserError("Amount residual is zero; nothing to collect.")
+        self.ensure_one()
+        if self.currency_id.is_zero(self.amount_residual):
+            raise UserError("Amount residual is zero; nothing to collect.")
+        # the delivery boy reports the cash actually collected
+        return {
+            'type': 'ir.actions.act_window',
+            'name': "Collect",
+            'res_model': 'delivery.collect.wizard',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': {'default_delivery_id': self.id},
+        }
+
+    def _collect(self, amount, currency):
+        """ Record ``amount`` in ``currency`` as collected for ``self``, to be
+        reconciled against the invoice by delivery.collection.
+        """
+        self.ensure_one()
+        date = fields.Date.context_today(self)
+        due_currency = self.move_id.currency_id or self.currency_id
+        self.write({'delivery_state': 'collection'})
+        return self.env['delivery.collection'].create({
+            'delivery_id': self.id,
+            'date': date,
+            'amount_residual': due_currency._convert(
+                self.amount_residual, currency, self.company_id or self.env.company, date),
+            'amount': amount,
+            'currency_id': currency.id,
+        })
 
     def action_fill_order_lines_from_invoice(self):
         pass
@@ -107,48 +137,98 @@ class DeliveryOrder(models.Model):
 
     @api.depends('tax_excluded', 'total')
     def _compute_total_sums(self):
-        all_records = self.env['delivery.management'].search([])
+        # read from the running totals rather than summing every delivery
+        totals = self.env['delivery.management.totals'].get_totals()
+        tax_excluded = sum(row['tax_excluded'] for row in totals)
+        total = sum(row['total'] for row in totals)
         for record in self:
-            record.total_tax_excluded_sum = sum(r.tax_excluded or 0.0 for r in all_records)
-            record.total_amount_sum = sum(r.total or 0.0 for r in all_records)
+            record.total_tax_excluded_sum = tax_excluded
+            record.total_amount_sum = total
 
-    @api.model
-    def create(self, vals):
-        if vals.get('delivery_boy'):
-            vals['delivery_state'] = 'transit'
-        record = super().create(vals)
-        if record.number:
-            record.action_fill_order_lines_from_invoice()
-        return record
-
-    def write(self, vals):
-        res = super().write(vals)
+    def _totals_values(self, sign=1):
+        """ Return the contribution of ``self`` to the running totals as
+        ``{(company_id, delivery_state, delivery_boy): [tax_excluded, total, count]}``.
+        """
+        values = defaultdict(lambda: [0.0, 0.0, 0])
         for record in self:
+            row = values[(record.company_id.id, record.delivery_state, record.delivery_boy.id)]
+            row[0] += sign * (record.tax_excluded or 0.0)
+            row[1] += sign * (record.total or 0.0)
+            row[2] += sign
+        return values
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
             if vals.get('delivery_boy'):
-                record.delivery_state = 'transit'
-            elif 'delivery_boy' in vals and not vals.get('delivery_boy'):
-                record.delivery_state = 'draft'
-            if 'number' in vals or not record.order_line_ids:
+                vals['delivery_state'] = 'transit'
+        records = super().create(vals_list)
+        self.env['delivery.management.totals']._apply_delta(records._totals_values())
+        self.env['delivery.state.log']._log_transitions([
+            (record, False, record.delivery_state) for record in records if record.delivery_state
+        ])
+        for record in records:
+            if record.number:
                 record.action_fill_order_lines_from_invoice()
+        return records
+
+    def write(self, vals):
+        if 'delivery_boy' in vals and 'delivery_state' not in vals:
+            # assigning moves the deliveries to transit, unassigning back to draft
+            vals = dict(vals, delivery_state='transit' if vals['delivery_boy'] else 'draft')
+        previous_states = {record: record.delivery_state for record in self} if 'delivery_state' in vals else {}
+        if set(vals) & set(TOTALS_FIELDS):
+            deltas = self._totals_values(sign=-1)
+            res = super().write(vals)
+            for key, (tax_excluded, total, count) in self._totals_values().items():
+                deltas[key][0] += tax_excluded
+                deltas[key][1] += total
+                deltas[key][2] += count
+            self.env['delivery.management.totals']._apply_delta(deltas)
+        else:
+            res = super().write(vals)
+        self.env['delivery.state.log']._log_transitions([
+            (record, previous_state, record.delivery_state)
+            for record, previous_state in previous_states.items()
+            if previous_state != record.delivery_state
+        ])
+        to_fill = self if 'number' in vals else self.filtered(lambda record: not record.order_line_ids)
+        to_fill.action_fill_order_lines_from_invoice()
+        return res
+
+    def action_bulk_assign(self, delivery_boy_id):
+        """ Assign the delivery boy ``delivery_boy_id`` to the deliveries of
+        ``self`` that can still be assigned, with a single write.
+
+        :return: ``{'assigned': n, 'skipped': n, 'total': amount}``
+        """
+        delivery_boy = self.env['delivery.boy'].browse(delivery_boy_id).exists()
+        if not delivery_boy:
+            raise UserError("The delivery boy no longer exists.")
+        assignable = self.search([
+            ('id', 'in', self.ids),
+            ('delivery_state', 'in', self.ASSIGNABLE_STATES),
+            '|', ('company_id', '=', False), ('company_id', 'in', list(delivery_boy._allowed_company_ids())),
+        ])
+        assignable.write({'delivery_boy': delivery_boy.id})
+        [(total,)] = self._read_group([('id', 'in', assignable.ids)], [], ['total:sum'])
+        return {
+            'assigned': len(assignable),
+            'skipped': len(self) - len(assignable),
+            'total': total or 0.0,
+        }
+
+    def unlink(self):
+        deltas = self._totals_values(sign=-1)
+        res = super().unlink()
+        self.env['delivery.management.totals']._apply_delta(deltas)
         return res
 
     def action_cancel_delivery(self):
-        for record in self:
-            record.delivery_state = 'cancel_delivery'
+        self.write({'delivery_state': 'cancel_delivery'})
 
     def action_onway_delivery(self):
-        for record in self:
-            record.delivery_state = "onway"
-
-    @api.depends('number')
-    def update_payment_state(self):
-        """
-        Update payment state based on the related invoice.
-        """
-        for record in self:
-            if record.number:
-                invoice = self.env['account.move'].search([('name', '=', record.number)], limit=1)
-                record.payment_state = invoice.payment_state if invoice else 'not_paid'
+        self.write({'delivery_state': 'onway'})
 
 
 class AccountMove(models.Model):
@@ -175,102 +255,159 @@ class AccountMove(models.Model):
     #     return res
 
 
-    def _update_delivery_management_record(self, move):
-
-        if move.move_type != 'out_invoice':
-            return
-
-        relative_due_date = self._get_relative_date(move.invoice_date_due)
-
+    # account.move fields whose change is propagated to the deliveries
+    DELIVERY_SYNC_FIELDS = (
+        'invoice_date_due', 'amount_total', 'amount_untaxed_in_currency_signed', 'amount_residual',
+        'payment_state', 'state', 'partner_id', 'name', 'invoice_line_ids', 'line_ids',
+    )
 
-        delivery_data = {
-            'due_date': relative_due_date,
-            'total': move.amount_total,
-            'total_in_currency': move.amount_total,
-            'tax_excluded': move.amount_untaxed_in_currency_signed,
-            'order_amount_due': move.amount_residual,
-            'payment_state': move.payment_state,
-            'status': move.state,
+    def _update_delivery_management_record(self, move):
+        move._sync_delivery_management()
+
+    def _prepare_delivery_management_values(self, address_id=None):
+        self.ensure_one()
+        if address_id is None:
+            address_id = self.env['delivery.address']._get_for_partners(self.partner_id).get(self.partner_id.id)
+        return {
+            'due_date': self._get_relative_date(self.invoice_date_due),
+            'total': self.amount_total,
+            'total_in_currency': self.amount_total,
+            'tax_excluded': self.amount_untaxed_in_currency_signed,
+            'order_amount_due': self.amount_residual,
+            'status': self.state,
             'currency_id': self.env.company.currency_id.id,
-            'customer_name': move.partner_id.id or '',
-            'customer_mobile': move.partner_id.mobile or '',
-            'customer_address': move.partner_id.street or '',
-            # 'customer_address': self._get_complete_address(move.partner_id),
-            'customer_address1': move.partner_id.street2 or '',
-            'customer_address2': move.partner_id.zip or '',
-            'customer_address3': move.partner_id.city or '',
-            'customer_address4': move.partner_id.state_id.name or '',
-            'customer_address5': move.partner_id.country_id.name or '',
-            'number': move.name,
-            'amount_residual':move.amount_residual,
+            'company_id': self.company_id.id,
+            'customer_name': self.partner_id.id,
+            'address_id': address_id or False,
+            'number': self.name,
+            'move_id': self.id,
+            'amount_residual': self.amount_residual,
         }
 
-        if move.delivery_management:
-            # Remove old order lines to avoid duplicate lines
-            move.delivery_management.order_line_ids.unlink()
-            # Update main fields
-            move.delivery_management.write(delivery_data)
-            # Create new order lines
-            for line in move.invoice_line_ids:
-                self.env['delivery.management.line'].create({
-                    'delivery_id': move.delivery_management.id,
-                    'product_id': line.product_id.id,
-                    'description': line.name,
-                    'quantity': line.quantity,
-                    'price_unit': line.price_unit,
-                    'taxes': [(6, 0, line.tax_ids.ids)],
-                    'price_subtotal': line.price_subtotal,
-                })
-        else:
-            # Add order lines in create
-            delivery_data['order_line_ids'] = [
-                (0, 0, {
-                    'product_id': line.product_id.id,
-                    'description': line.name,
-                    'quantity': line.quantity,
-                    'price_unit': line.price_unit,
-                    'taxes': [(6, 0, line.tax_ids.ids)],
-                    'price_subtotal': line.price_subtotal,                })
-                for line in move.invoice_line_ids
-            ]
-            delivery = self.env['delivery.management'].create(delivery_data)
-            move.delivery_management = delivery
+    @api.model
+    def _prepare_delivery_line_values(self, line):
+        return {
+            'invoice_line_id': line.id,
+            'product_id': line.product_id.id,
+            'description': line.name,
+            'quantity': line.quantity,
+            'price_unit': line.price_unit,
+            'taxes': [(6, 0, line.tax_ids.ids)],
+            'price_subtotal': line.price_subtotal,
+        }
 
-    # def write(self, vals):
-    #     res = super().write(vals)
-    #     for move in self:
-    #         if move.move_type == 'out_invoice' and (
-    #                 'invoice_date_due' in vals or 'amount_total' in vals or
-    #                 'amount_untaxed_in_currency_signed' in vals or 'amount_residual' in vals or
-    #                 'payment_state' in vals or 'state' in vals or
-    #                 'partner_id' in vals or 'name' in vals
-    #         ):
-    #             self._update_delivery_management_record(move)
-    #     return res
+    @api.model
+    def _changed_values(self, record, vals):
+        """ Return the items of ``vals`` that differ from ``record``. """
+        changed = {}
+        for fname, value in vals.items():
+            field = record._fields[fname]
+            if field.type == 'many2many':
+                if set(record[fname].ids) != set(value[0][2]):
+                    changed[fname] = value
+                continue
+            current = field.convert_to_write(record[fname], record)
+            if (current or False) != (value or False):
+                changed[fname] = value
+        return changed
+
+    @api.model
+    def _write_grouped(self, records_vals):
+        """ Write ``[(record, vals)]`` with one ``write`` per distinct vals. """
+        groups = {}
+        for record, vals in records_vals:
+            if not vals:
+                continue
+            key = repr(sorted(vals.items()))
+            groups.setdefault(key, (vals, []))[1].append(record.id)
+        for vals, ids in groups.values():
+            records_vals[0][0].browse(ids).write(vals)
+
+    def _sync_delivery_management(self):
+        """ Create or update the deliveries of the customer invoices in
+        ``self`` as a batch: deliveries and lines are created with one
+        ``create`` each, and existing ones only get the values that changed
+        written; delivery lines are matched to invoice lines by
+        ``invoice_line_id``.
+        """
+        moves = self.filtered(lambda move: move.move_type == 'out_invoice')
+        if not moves:
+            return
+        Delivery = self.env['delivery.management']
+        DeliveryLine = self.env['delivery.management.line']
+        # one address snapshot lookup for all the partners of the batch
+        addresses = self.env['delivery.address']._get_for_partners(moves.partner_id)
+
+        new_moves = moves.filtered(lambda move: not move.delivery_management)
+        if new_moves:
+            vals_list = []
+            for move in new_moves:
+                vals = move._prepare_delivery_management_values(addresses.get(move.partner_id.id))
+                vals['order_line_ids'] = [
+                    (0, 0, self._prepare_delivery_line_values(line)) for line in move.invoice_line_ids
+                ]
+                vals_list.append(vals)
+            deliveries = Delivery.create(vals_list)
+            # link the moves without going through account.move.write
+            self.env.cr.execute(SQL(
+                "UPDATE account_move SET delivery_management = link.delivery_id "
+                "FROM (VALUES %s) AS link(move_id, delivery_id) WHERE account_move.id = link.move_id",
+                SQL(", ").join(SQL("(%s, %s)", move.id, delivery.id)
+                               for move, delivery in zip(new_moves, deliveries)),
+            ))
+            new_moves.invalidate_recordset(['delivery_management'])
+
+        existing_moves = moves - new_moves
+        if not existing_moves:
+            return
+        self._write_grouped([
+            (move.delivery_management,
+             self._changed_values(move.delivery_management,
+                                  move._prepare_delivery_management_values(addresses.get(move.partner_id.id))))
+            for move in existing_moves
+        ])
+
+        line_vals_list = []
+        line_updates = []
+        obsolete_lines = DeliveryLine
+        for move in existing_moves:
+            delivery = move.delivery_management
+            delivery_lines = {line.invoice_line_id.id: line for line in delivery.order_line_ids
+                              if line.invoice_line_id}
+            obsolete_lines |= delivery.order_line_ids.filtered(lambda line: not line.invoice_line_id)
+            for invoice_line in move.invoice_line_ids:
+                vals = self._prepare_delivery_line_values(invoice_line)
+                delivery_line = delivery_lines.pop(invoice_line.id, None)
+                if delivery_line:
+                    line_updates.append((delivery_line, self._changed_values(delivery_line, vals)))
+                else:
+                    line_vals_list.append(dict(vals, delivery_id=delivery.id))
+            for delivery_line in delivery_lines.values():
+                obsolete_lines |= delivery_line
+        obsolete_lines.unlink()
+        self._write_grouped(line_updates)
+        DeliveryLine.create(line_vals_list)
+
+    def _schedule_delivery_sync(self):
+        """ Synchronize the deliveries of ``self`` right away or, in queued
+        mode, leave it to the delivery.sync.job worker.
+        """
+        moves = self.filtered(lambda move: move.move_type == 'out_invoice')
+        SyncJob = self.env['delivery.sync.job']
+        if SyncJob._is_queued_mode():
+            SyncJob.sudo()._enqueue(moves)
+        else:
+            moves._sync_delivery_management()
 
     def write(self, vals):
         res = super().write(vals)
-        for move in self:
-            if move.move_type == 'out_invoice' and (
-                    'invoice_date_due' in vals or 'amount_total' in vals or
-                    'amount_untaxed_in_currency_signed' in vals or 'amount_residual' in vals or
-                    'payment_state' in vals or 'state' in vals or
-                    'partner_id' in vals or 'name' in vals
-            ):
-                self._update_delivery_management_record(move)
-
-                # 👇 Add this to also update payment status!
-                delivery = self.env['delivery.management'].search([('number', '=', move.name)], limit=1)
-                if delivery:
-                    delivery.update_payment_state()
-
+        if set(vals) & set(self.DELIVERY_SYNC_FIELDS):
+            self._schedule_delivery_sync()
         return res
 
     def action_post(self):
         res = super().action_post()
-        for move in self:
-            if move.move_type == 'out_invoice':
-                self._update_delivery_management_record(move)
+        self._schedule_delivery_sync()
         return res
 
     def _get_complete_address(self, partner):
@@ -312,6 +449,8 @@ class DeliveryManagementLine(models.Model):
 
 
     delivery_id = fields.Many2one('delivery.management', string='Delivery Reference', ondelete='cascade')
+    invoice_line_id = fields.Many2one('account.move.line', string='Invoice Line', index='btree_not_null',
+                                      ondelete='set null')
     product_id = fields.Many2one('product.product', 'product')
     description = fields.Char(string='Description')
     quantity = fields.Float(string='Quantity', default=1.0)
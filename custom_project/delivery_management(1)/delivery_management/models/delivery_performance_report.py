@@ -0,0 +1,88 @@
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+
+# the transitions counted as a delivery done, and cancelled
+DELIVERED_STATE = 'arrived'
+CANCELLED_STATE = 'cancel_delivery'
+
+
+class DeliveryPerformanceReport(models.Model):
+    _name = 'delivery.performance.report'
+    _description = 'Delivery Performance Analysis'
+    _auto = False
+    _order = 'day desc'
+    _rec_name = 'day'
+
+    day = fields.Date(string="Day", readonly=True)
+    delivery_boy = fields.Many2one('delivery.boy', string="Delivery Boy", readonly=True)
+    transportation = fields.Selection([
+        ('car', 'Car'),
+        ('bike', 'Bike'),
+        ('truck', 'Truck'),
+    ], string="Transportation", readonly=True)
+    company_id = fields.Many2one('res.company', string="Company", readonly=True)
+    delivered_count = fields.Integer(string="Delivered", readonly=True)
+    cancelled_count = fields.Integer(string="Cancelled", readonly=True)
+    collection_count = fields.Integer(string="Collections", readonly=True)
+    collected_amount = fields.Float(string="Collected Amount", readonly=True)
+
+    def _query(self):
+        """ One row per day, delivery boy and company, out of the state
+        transition log (deliveries done and cancelled) and the collections.
+        """
+        return SQL(
+            """
+            WITH facts AS (
+                SELECT date::date AS day, delivery_boy, company_id,
+                       (to_state = %(delivered)s)::int AS delivered,
+                       (to_state = %(cancelled)s)::int AS cancelled,
+                       0 AS collections, 0.0 AS collected
+                  FROM %(state_log)s
+                 WHERE to_state IN (%(delivered)s, %(cancelled)s)
+                   AND delivery_boy IS NOT NULL
+             UNION ALL
+                SELECT date, delivery_boy, company_id, 0, 0, 1, COALESCE(amount, 0.0)
+                  FROM %(collection)s
+                 WHERE delivery_boy IS NOT NULL
+            )
+              SELECT ROW_NUMBER() OVER (ORDER BY facts.day, facts.delivery_boy, facts.company_id) AS id,
+                     facts.day,
+                     facts.delivery_boy,
+                     boy.transportation,
+                     facts.company_id,
+                     COALESCE(facts.company_id, 0) AS company_key,
+                     SUM(facts.delivered) AS delivered_count,
+                     SUM(facts.cancelled) AS cancelled_count,
+                     SUM(facts.collections) AS collection_count,
+                     SUM(facts.collected) AS collected_amount
+                FROM facts
+                JOIN %(boy)s boy ON boy.id = facts.delivery_boy
+            GROUP BY facts.day, facts.delivery_boy, boy.transportation, facts.company_id
+            """,
+            delivered=DELIVERED_STATE,
+            cancelled=CANCELLED_STATE,
+            state_log=SQL.identifier(self.env['delivery.state.log']._table),
+            collection=SQL.identifier(self.env['delivery.collection']._table),
+            boy=SQL.identifier(self.env['delivery.boy']._table),
+        )
+
+    def init(self):
+        # a materialized view, so that a year of history is grouped from a
+        # few thousand rows; a plain unique index (no expression) is what
+        # lets it be refreshed concurrently, without locking out readers
+        tools.drop_view_if_exists(self._cr, self._table)
+        self._cr.execute(SQL(
+            "CREATE MATERIALIZED VIEW %s AS (%s)",
+            SQL.identifier(self._table), self._query(),
+        ))
+        self._cr.execute(SQL(
+            "CREATE UNIQUE INDEX %s ON %s (day, delivery_boy, company_key)",
+            SQL.identifier('%s_key_uniq' % self._table), SQL.identifier(self._table),
+        ))
+        tools.create_index(self._cr, '%s_delivery_boy_index' % self._table, self._table, ['delivery_boy'])
+
+    @api.model
+    def _cron_refresh(self):
+        self.env.flush_all()
+        self.env.cr.execute(SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY %s", SQL.identifier(self._table)))
+        self.invalidate_model()
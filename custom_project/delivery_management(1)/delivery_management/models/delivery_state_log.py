@@ -0,0 +1,192 @@
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+
+class DeliveryStateLog(models.Model):
+    _name = 'delivery.state.log'
+    _description = 'Delivery State Transition'
+    _order = 'date desc, id desc'
+    _log_access = False
+
+    delivery_id = fields.Many2one('delivery.management', string="Delivery", required=True, index=True,
+                                  ondelete='cascade')
+    delivery_boy = fields.Many2one('delivery.boy', string="Delivery Boy", ondelete='set null')
+    company_id = fields.Many2one('res.company', string="Company", ondelete='cascade')
+    from_state = fields.Char(string="From")
+    to_state = fields.Char(string="To", required=True)
+    date = fields.Datetime(string="Date", required=True)
+
+    def init(self):
+        # rows are only ever appended in date order: a BRIN index keeps date
+        # range scans cheap for a fraction of the size of a btree
+        tools.create_index(self._cr, 'delivery_state_log_date_brin', self._table, ['date'], method='brin')
+        # start the log of the existing deliveries from their current state
+        self._cr.execute(SQL("SELECT 1 FROM %s LIMIT 1", SQL.identifier(self._table)))
+        if not self._cr.fetchone():
+            self._cr.execute(SQL(
+                """
+                INSERT INTO %s (delivery_id, delivery_boy, company_id, to_state, date)
+                     SELECT id, delivery_boy, company_id, delivery_state, write_date
+                       FROM %s
+                      WHERE delivery_state IS NOT NULL
+                   ORDER BY write_date
+                """,
+                SQL.identifier(self._table),
+                SQL.identifier(self.env['delivery.management']._table),
+            ))
+
+    def write(self, vals):
+        raise UserError("Delivery state transitions cannot be modified.")
+
+    def unlink(self):
+        raise UserError("Delivery state transitions cannot be deleted.")
+
+    @api.model
+    def _log_transitions(self, transitions):
+        """ Append ``transitions`` (``[(delivery, from_state, to_state)]``) to
+        the log with one insert, and add the time spent in each left state to
+        the daily durations.
+        """
+        if not transitions:
+            return
+        now = fields.Datetime.now()
+        deliveries = self.env['delivery.management'].browse({delivery.id for delivery, _from, _to in transitions})
+
+        # when each delivery entered its previous state
+        self.env.cr.execute(SQL(
+            """
+            SELECT DISTINCT ON (delivery_id) delivery_id, date
+              FROM %s
+             WHERE delivery_id = ANY(%s)
+          ORDER BY delivery_id, date DESC, id DESC
+            """,
+            SQL.identifier(self._table), deliveries.ids,
+        ))
+        entered = dict(self.env.cr.fetchall())
+
+        rows = []
+        durations = defaultdict(lambda: [0, 0.0])
+        for delivery, from_state, to_state in transitions:
+            rows.append(SQL("(%s, %s, %s, %s, %s, %s)",
+                            delivery.id, delivery.delivery_boy.id or None, delivery.company_id.id or None,
+                            from_state or None, to_state, now))
+            if from_state and delivery.id in entered:
+                duration = durations[(now.date(), delivery.company_id.id, delivery.delivery_boy.id, from_state)]
+                duration[0] += 1
+                duration[1] += (now - entered[delivery.id]).total_seconds()
+            entered[delivery.id] = now
+        self.env.cr.execute(SQL(
+            "INSERT INTO %s (delivery_id, delivery_boy, company_id, from_state, to_state, date) VALUES %s",
+            SQL.identifier(self._table), SQL(", ").join(rows),
+        ))
+        self.env['delivery.state.duration']._add_durations(durations)
+
+    @api.model
+    def get_transition_sla(self, from_state='transit', to_state='arrived', date_from=None, date_to=None):
+        """ Median and average time taken by each delivery boy from entering
+        ``from_state`` to reaching ``to_state``, for the deliveries having
+        reached ``to_state`` between ``date_from`` and ``date_to``.
+
+        :return: ``[{'delivery_boy': id, 'count': n, 'median_hours': x,
+            'average_hours': y}]``
+        """
+        period = SQL("TRUE")
+        if date_from:
+            period = SQL("%s AND date >= %s", period, fields.Datetime.to_datetime(date_from))
+        if date_to:
+            period = SQL("%s AND date < %s", period, fields.Datetime.to_datetime(date_to))
+        self.env.cr.execute(SQL(
+            """
+            WITH spans AS (
+                SELECT delivery_id,
+                       (ARRAY_AGG(delivery_boy ORDER BY date DESC, id DESC)
+                            FILTER (WHERE to_state = %(to_state)s))[1] AS delivery_boy,
+                       MIN(date) FILTER (WHERE to_state = %(from_state)s) AS started,
+                       MIN(date) FILTER (WHERE to_state = %(to_state)s) AS reached
+                  FROM %(table)s
+                 WHERE delivery_id IN (SELECT delivery_id FROM %(table)s WHERE to_state = %(to_state)s AND %(period)s)
+              GROUP BY delivery_id
+            )
+            SELECT delivery_boy, COUNT(*),
+                   PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM reached - started)) / 3600,
+                   AVG(EXTRACT(EPOCH FROM reached - started)) / 3600
+              FROM spans
+             WHERE reached > started
+          GROUP BY delivery_boy
+            """,
+            table=SQL.identifier(self._table),
+            from_state=from_state,
+            to_state=to_state,
+            period=period,
+        ))
+        return [{
+            'delivery_boy': delivery_boy,
+            'count': count,
+            'median_hours': median,
+            'average_hours': float(average),
+        } for delivery_boy, count, median, average in self.env.cr.fetchall()]
+
+
+class DeliveryStateDuration(models.Model):
+    _name = 'delivery.state.duration'
+    _description = 'Delivery Daily State Durations'
+    _order = 'day desc'
+    _log_access = False
+
+    day = fields.Date(string="Day", required=True, index=True)
+    company_id = fields.Many2one('res.company', string="Company", ondelete='cascade')
+    delivery_boy = fields.Many2one('delivery.boy', string="Delivery Boy", ondelete='cascade')
+    state = fields.Char(string="State", required=True)
+    count = fields.Integer(string="Transitions")
+    duration = fields.Float(string="Total Duration (s)")
+
+    def init(self):
+        tools.create_unique_index(
+            self._cr, 'delivery_state_duration_scope_uniq', self._table,
+            ['day', 'COALESCE(company_id, 0)', 'COALESCE(delivery_boy, 0)', 'state'],
+        )
+
+    @api.model
+    def _add_durations(self, durations):
+        """ Add ``durations`` (``{(day, company_id, delivery_boy, state):
+        (count, seconds)}``) to the daily aggregates in a single upsert.
+        """
+        if not durations:
+            return
+        rows = [
+            SQL("(%s, %s, %s, %s, %s, %s)", day, company_id or None, delivery_boy or None, state, count, seconds)
+            for (day, company_id, delivery_boy, state), (count, seconds) in durations.items()
+        ]
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO %(table)s (day, company_id, delivery_boy, state, count, duration)
+            VALUES %(rows)s
+            ON CONFLICT (day, (COALESCE(company_id, 0)), (COALESCE(delivery_boy, 0)), state)
+            DO UPDATE SET count = %(table)s.count + EXCLUDED.count,
+                          duration = %(table)s.duration + EXCLUDED.duration
+            """,
+            table=SQL.identifier(self._table),
+            rows=SQL(", ").join(rows),
+        ))
+        self.invalidate_model(['count', 'duration'])
+
+    @api.model
+    def get_average_durations(self, date_from, date_to, groupby=('delivery_boy', 'state')):
+        """ Average time spent per state, in hours, between ``date_from`` and
+        ``date_to`` (both included), read from the daily aggregates.
+        """
+        groupby = list(groupby)
+        domain = [('day', '>=', date_from), ('day', '<=', date_to)]
+        result = []
+        for row in self._read_group(domain, groupby, ['count:sum', 'duration:sum']):
+            values = dict(zip(groupby, row))
+            if 'delivery_boy' in values:
+                values['delivery_boy'] = values['delivery_boy'].id
+            count, duration = row[len(groupby):]
+            values['count'] = count
+            values['average_hours'] = duration / count / 3600 if count else 0.0
+            result.append(values)
+        return result
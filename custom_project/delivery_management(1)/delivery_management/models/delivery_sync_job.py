@@ -0,0 +1,165 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# ir.config_parameter keys
+SYNC_MODE_PARAM = 'delivery_management.sync_mode'
+SYNC_BATCH_SIZE_PARAM = 'delivery_management.sync_batch_size'
+
+MAX_ATTEMPTS = 5
+
+
+class DeliverySyncJob(models.Model):
+    _name = 'delivery.sync.job'
+    _description = 'Delivery Synchronization Job'
+    _order = 'id'
+
+    move_id = fields.Many2one('account.move', string="Invoice", required=True, ondelete='cascade', index=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ], string="Status", default='pending', required=True, index=True)
+    attempts = fields.Integer(string="Attempts", default=0)
+    next_attempt = fields.Datetime(string="Next Attempt")
+    last_error = fields.Text(string="Last Error")
+
+    def init(self):
+        # the queue is append-only: enqueueing a move already queued must not
+        # wait for the worker holding the lock on its job
+        self.env.cr.execute(SQL(
+            "ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s",
+            SQL.identifier(self._table), SQL.identifier('%s_move_uniq' % self._table),
+        ))
+
+    @api.model
+    def _is_queued_mode(self):
+        return self.env['ir.config_parameter'].sudo().get_param(SYNC_MODE_PARAM, 'sync') == 'queued'
+
+    @api.model
+    def _enqueue(self, moves):
+        """ Queue the synchronization of ``moves``. Every enqueue appends a
+        new job, so that it never touches a job locked by a worker; the
+        worker deduplicates the jobs of a move.
+        """
+        if not moves:
+            return
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO %(table)s (move_id, state, attempts, create_uid, create_date, write_uid, write_date)
+                 SELECT move_id, 'pending', 0, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                   FROM unnest(%(move_ids)s) AS move_id
+            """,
+            table=SQL.identifier(self._table),
+            uid=self.env.uid,
+            move_ids=moves.ids,
+        ))
+        self.invalidate_model()
+        self.env.ref('delivery_management.ir_cron_delivery_sync')._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        """ Synchronize a batch of queued invoices. Several workers can drain
+        the queue at once, each one claiming the jobs it locks and skipping
+        the jobs locked by the others. The jobs claimed for a same invoice
+        are synchronized once; a job queued meanwhile is not claimed and runs
+        again later. Failing invoices are retried with an exponential
+        backoff, and left in the failed state after :data:`MAX_ATTEMPTS`
+        attempts.
+        """
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(SYNC_BATCH_SIZE_PARAM, 200))
+        now = fields.Datetime.now()
+        self.env.cr.execute(SQL(
+            """
+            SELECT id, move_id, attempts
+              FROM %s
+             WHERE state = 'pending' AND (next_attempt IS NULL OR next_attempt <= %s)
+          ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+            """,
+            SQL.identifier(self._table), now, batch_size,
+        ))
+        # {move_id: [(job_id, attempts)]}, oldest job first
+        jobs = defaultdict(list)
+        for job_id, move_id, attempts in self.env.cr.fetchall():
+            jobs[move_id].append((job_id, attempts))
+        moves = self.env['account.move'].browse(list(jobs))
+
+        failed = {}
+        try:
+            with self.env.cr.savepoint():
+                moves._sync_delivery_management()
+        except Exception:
+            # isolate the invoices making the batch fail
+            for move in moves:
+                try:
+                    with self.env.cr.savepoint():
+                        move._sync_delivery_management()
+                except Exception as e:
+                    _logger.warning("Delivery synchronization of invoice %s failed", move.id, exc_info=True)
+                    failed[move.id] = str(e)
+
+        # a failing invoice keeps its latest job, which carries the attempts
+        # since it was last queued; all the other claimed jobs are done
+        retried = {move_id: move_jobs[-1] for move_id, move_jobs in jobs.items() if move_id in failed}
+        kept_ids = {job_id for job_id, _attempts in retried.values()}
+        done_ids = [job_id for move_jobs in jobs.values() for job_id, _attempts in move_jobs if job_id not in kept_ids]
+        if done_ids:
+            self.env.cr.execute(SQL(
+                "DELETE FROM %s WHERE id = ANY(%s)",
+                SQL.identifier(self._table), done_ids,
+            ))
+        for move_id, (job_id, attempts) in retried.items():
+            self.env.cr.execute(SQL(
+                """
+                UPDATE %s
+                   SET attempts = attempts + 1, last_error = %s, next_attempt = %s,
+                       state = CASE WHEN attempts + 1 >= %s THEN 'failed' ELSE 'pending' END
+                 WHERE id = %s
+                """,
+                SQL.identifier(self._table), failed[move_id], now + timedelta(minutes=2 ** attempts),
+                MAX_ATTEMPTS, job_id,
+            ))
+        self.invalidate_model()
+        # only the jobs ready now are remaining: counting the ones waiting
+        # for their backoff would rerun the cron at once for nothing
+        self.env.cr.execute(SQL(
+            """
+            SELECT COUNT(DISTINCT move_id) FILTER (WHERE next_attempt IS NULL OR next_attempt <= %s),
+                   MIN(next_attempt) FILTER (WHERE next_attempt > %s)
+              FROM %s
+             WHERE state = 'pending'
+            """,
+            now, now, SQL.identifier(self._table),
+        ))
+        ready, next_attempt = self.env.cr.fetchone()
+        if next_attempt:
+            self.env.ref('delivery_management.ir_cron_delivery_sync')._trigger(at=next_attempt)
+        self.env['ir.cron']._notify_progress(done=len(jobs) - len(failed), remaining=ready)
+
+    @api.model
+    def get_backlog(self):
+        """ Return the size of the queue in invoices: ``{'pending': n,
+        'failed': n, 'oldest': create date of the oldest pending job or
+        False}``.
+        """
+        self.env.cr.execute(SQL(
+            """
+            SELECT COUNT(DISTINCT move_id) FILTER (WHERE state = 'pending'),
+                   COUNT(DISTINCT move_id) FILTER (WHERE state = 'failed'),
+                   MIN(create_date) FILTER (WHERE state = 'pending')
+              FROM %s
+            """,
+            SQL.identifier(self._table),
+        ))
+        pending, failed, oldest = self.env.cr.fetchone()
+        return {'pending': pending, 'failed': failed, 'oldest': oldest or False}
+
+    def action_retry(self):
+        self.write({'state': 'pending', 'attempts': 0, 'next_attempt': False})
+        self.env.ref('delivery_management.ir_cron_delivery_sync')._trigger()
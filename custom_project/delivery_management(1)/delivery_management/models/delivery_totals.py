@@ -0,0 +1,123 @@
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+
+class DeliveryManagementTotals(models.Model):
+    _name = 'delivery.management.totals'
+    _description = 'Delivery Management Running Totals'
+    _log_access = False
+
+    company_id = fields.Many2one('res.company', string="Company", index=True, ondelete='cascade')
+    delivery_state = fields.Char(string="Delivery Status")
+    delivery_boy = fields.Many2one('delivery.boy', string="Delivery Boy", ondelete='cascade')
+    tax_excluded = fields.Float(string="Tax Excluded")
+    total = fields.Float(string="Total")
+    count = fields.Integer(string="Count")
+
+    GROUPBY_FIELDS = ('company_id', 'delivery_state', 'delivery_boy')
+
+    def init(self):
+        # company_id and delivery_boy are NULL for unassigned deliveries,
+        # which would defeat a plain unique constraint
+        tools.create_unique_index(
+            self._cr, 'delivery_management_totals_scope_uniq', self._table,
+            ['COALESCE(company_id, 0)', 'COALESCE(delivery_boy, 0)', "COALESCE(delivery_state, '')"],
+        )
+        self._cr.execute(SQL("SELECT 1 FROM %s LIMIT 1", SQL.identifier(self._table)))
+        if not self._cr.fetchone():
+            self.action_recompute()
+
+    @api.model
+    def _apply_delta(self, deltas):
+        """ Add ``deltas`` (``{(company_id, delivery_state, delivery_boy):
+        (tax_excluded, total, count)}``) to the running totals in a single
+        upsert.
+        """
+        rows = [
+            SQL("(%s, %s, %s, %s, %s, %s)",
+                company_id or None, delivery_state or None, delivery_boy or None, tax_excluded, total, count)
+            for (company_id, delivery_state, delivery_boy), (tax_excluded, total, count) in deltas.items()
+            if tax_excluded or total or count
+        ]
+        if not rows:
+            return
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO %(table)s (company_id, delivery_state, delivery_boy, tax_excluded, total, count)
+            VALUES %(rows)s
+            ON CONFLICT ((COALESCE(company_id, 0)), (COALESCE(delivery_boy, 0)), (COALESCE(delivery_state, '')))
+            DO UPDATE SET tax_excluded = %(table)s.tax_excluded + EXCLUDED.tax_excluded,
+                          total = %(table)s.total + EXCLUDED.total,
+                          count = %(table)s.count + EXCLUDED.count
+            """,
+            table=SQL.identifier(self._table),
+            rows=SQL(", ").join(rows),
+        ))
+        self.invalidate_model(['tax_excluded', 'total', 'count'])
+
+    @api.model
+    def action_recompute(self):
+        """ Bring the running totals back in line with ``delivery.management``,
+        correcting any drift left by writes that bypassed the ORM hooks (SQL
+        updates, imports, ...). Only the differences are written.
+        """
+        deliveries = self.env['delivery.management']
+        deliveries.flush_model(['company_id', 'delivery_state', 'delivery_boy', 'tax_excluded', 'total'])
+        self.flush_model()
+        deltas = defaultdict(lambda: [0.0, 0.0, 0])
+        self.env.cr.execute(SQL(
+            """
+            SELECT company_id, delivery_state, delivery_boy,
+                   SUM(COALESCE(tax_excluded, 0)), SUM(COALESCE(total, 0)), COUNT(*)
+              FROM %s
+          GROUP BY company_id, delivery_state, delivery_boy
+            """,
+            SQL.identifier(deliveries._table),
+        ))
+        for company_id, delivery_state, delivery_boy, tax_excluded, total, count in self.env.cr.fetchall():
+            delta = deltas[(company_id or False, delivery_state or False, delivery_boy or False)]
+            delta[0] += tax_excluded
+            delta[1] += total
+            delta[2] += count
+        self.env.cr.execute(SQL(
+            "SELECT company_id, delivery_state, delivery_boy, tax_excluded, total, count FROM %s FOR UPDATE",
+            SQL.identifier(self._table),
+        ))
+        for company_id, delivery_state, delivery_boy, tax_excluded, total, count in self.env.cr.fetchall():
+            delta = deltas[(company_id or False, delivery_state or False, delivery_boy or False)]
+            delta[0] -= tax_excluded or 0.0
+            delta[1] -= total or 0.0
+            delta[2] -= count or 0
+        # leave out the rounding noise of summing floats in another order
+        self._apply_delta({
+            key: (round(tax_excluded, 6), round(total, 6), count)
+            for key, (tax_excluded, total, count) in deltas.items()
+        })
+        return True
+
+    @api.model
+    def get_totals(self, groupby=(), company_ids=None):
+        """ Return the totals of the deliveries of ``company_ids`` (the current
+        companies by default), grouped by any of :attr:`GROUPBY_FIELDS`.
+
+        :return: list of ``{<groupby field>: value, 'tax_excluded': x,
+            'total': y, 'count': n}``
+        """
+        groupby = list(groupby)
+        for fname in groupby:
+            if fname not in self.GROUPBY_FIELDS:
+                raise UserError("Delivery totals cannot be grouped by %s" % fname)
+        company_ids = company_ids or self.env.companies.ids
+        domain = ['|', ('company_id', 'in', company_ids), ('company_id', '=', False)]
+        result = []
+        for row in self.sudo()._read_group(domain, groupby, ['tax_excluded:sum', 'total:sum', 'count:sum']):
+            values = dict(zip(groupby, row))
+            for fname in ('company_id', 'delivery_boy'):
+                if fname in values:
+                    values[fname] = values[fname].id
+            values['tax_excluded'], values['total'], values['count'] = row[len(groupby):]
+            result.append(values)
+        return result
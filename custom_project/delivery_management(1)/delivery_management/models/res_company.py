@@ -0,0 +1,31 @@
+from odoo import models, api, tools
+from odoo.tools import frozendict
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    @api.model
+    @tools.ormcache()
+    def _get_company_names(self):
+        """ Return ``{company id: name}`` of all the companies, cached in the
+        registry until a company is created, renamed or deleted.
+        """
+        return frozendict((company.id, company.name) for company in self.sudo().search([]))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        companies = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return companies
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'name' in vals or 'active' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -0,0 +1,2 @@
+from . import test_delivery_collection
+from . import test_delivery_sync_job
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.addons.delivery_management.models.delivery_sync_job import SYNC_MODE_PARAM
+
+
+@tagged('post_install', '-at_install')
+class TestDeliveryCollection(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param(SYNC_MODE_PARAM, 'sync')
+        cls.Collection = cls.env['delivery.collection']
+
+    def _collect(self, amount_delta=0.0, invoice=None):
+        """ Collect the total of a new invoice plus ``amount_delta``. """
+        invoice = invoice or self.init_invoice('out_invoice', amounts=[100.0], post=True)
+        delivery = invoice.delivery_management
+        self.assertTrue(delivery, "posting the invoice should create its delivery")
+        return invoice, delivery._collect(invoice.amount_total + amount_delta, invoice.currency_id)
+
+    def test_reconcile_full(self):
+        invoice, collection = self._collect()
+        summary = collection.action_reconcile()
+        self.assertEqual(summary['reconciled'], 1)
+        self.assertRecordValues(collection, [{
+            'state': 'reconciled', 'discrepancy_reason': False, 'discrepancy': 0.0, 'reconcile_error': False,
+        }])
+        self.assertTrue(collection.payment_id)
+        self.assertTrue(invoice.currency_id.is_zero(invoice.amount_residual))
+
+    def test_reconcile_short(self):
+        invoice, collection = self._collect(-40.0)
+        collection.action_reconcile()
+        self.assertRecordValues(collection, [{
+            'state': 'discrepancy', 'discrepancy_reason': 'short', 'discrepancy': -40.0,
+        }])
+        self.assertTrue(collection.payment_id, "what was collected should be paid")
+        self.assertAlmostEqual(invoice.amount_residual, 40.0)
+
+    def test_reconcile_over(self):
+        invoice, collection = self._collect(50.0)
+        collection.action_reconcile()
+        self.assertRecordValues(collection, [{
+            'state': 'discrepancy', 'discrepancy_reason': 'over', 'discrepancy': 50.0,
+        }])
+        self.assertTrue(invoice.currency_id.is_zero(invoice.amount_residual), "only the residual should be paid")
+
+    def test_reconcile_no_invoice(self):
+        delivery = self.env['delivery.management'].create({'amount_residual': 80.0})
+        collection = delivery._collect(80.0, delivery.currency_id)
+        collection.action_reconcile()
+        self.assertRecordValues(collection, [{
+            'state': 'discrepancy', 'discrepancy_reason': 'no_invoice', 'discrepancy': 80.0, 'payment_id': False,
+        }])
+
+    def test_reconcile_batch(self):
+        collections = self.Collection
+        invoices = self.env['account.move']
+        for _i in range(3):
+            invoice, collection = self._collect()
+            invoices |= invoice
+            collections |= collection
+        summary = collections.action_reconcile()
+        self.assertEqual(summary['reconciled'], 3)
+        self.assertEqual(set(collections.mapped('state')), {'reconciled'})
+        self.assertTrue(all(invoice.currency_id.is_zero(invoice.amount_residual) for invoice in invoices))
+
+    def test_reconcile_failure_is_isolated(self):
+        _invoice, collection = self._collect()
+        with patch.object(self.registry['delivery.collection'], '_get_collection_journal',
+                          autospec=True, side_effect=UserError("No cash journal")):
+            summary = collection.action_reconcile()
+        self.assertEqual(summary['errors'], 1)
+        self.assertRecordValues(collection, [{'state': 'error', 'reconcile_error': "No cash journal"}])
+
+        # reconciled by the next run
+        collection.action_reconcile()
+        self.assertRecordValues(collection, [{'state': 'reconciled', 'reconcile_error': False}])
@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.addons.delivery_management.models.delivery_sync_job import MAX_ATTEMPTS, SYNC_MODE_PARAM
+
+
+@tagged('post_install', '-at_install')
+class TestDeliverySyncJob(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param(SYNC_MODE_PARAM, 'queued')
+        cls.SyncJob = cls.env['delivery.sync.job']
+        cls.invoice = cls.init_invoice('out_invoice', amounts=[100.0], post=True)
+
+    def _jobs(self):
+        return self.SyncJob.search([('move_id', '=', self.invoice.id)])
+
+    def _process(self, sync):
+        """ Run the worker with ``sync(moves)`` as synchronization, and return
+        the ids of the moves it was called with, once per call.
+        """
+        synced = []
+
+        def side_effect(moves):
+            synced.append(moves.ids)
+            return sync(moves)
+
+        self.env.flush_all()
+        with patch.object(self.registry['account.move'], '_sync_delivery_management',
+                          autospec=True, side_effect=side_effect):
+            self.SyncJob._cron_process_jobs()
+        self.SyncJob.invalidate_model()
+        return synced
+
+    def test_post_enqueues_without_synchronizing(self):
+        self.assertTrue(self._jobs(), "posting in queued mode should queue a job")
+        self.assertFalse(self.invoice.delivery_management)
+
+    def test_enqueue_appends_and_worker_dedupes(self):
+        jobs_count = len(self._jobs())
+        self.SyncJob._enqueue(self.invoice)
+        self.SyncJob._enqueue(self.invoice)
+        self.assertEqual(len(self._jobs()), jobs_count + 2, "every enqueue should append a job")
+        self.assertEqual(self.SyncJob.get_backlog()['pending'], len(self.SyncJob.search([
+            ('state', '=', 'pending'),
+        ]).move_id), "the backlog should count invoices, not jobs")
+
+        synced = self._process(lambda moves: None)
+        self.assertEqual(len(synced), 1)
+        self.assertEqual(synced[0].count(self.invoice.id), 1, "the invoice should be synchronized once")
+        self.assertFalse(self._jobs(), "all the jobs claimed for the invoice should be done")
+
+    def test_enqueue_while_processing_is_kept(self):
+        # the invoice changes while the worker synchronizes it: the new job is
+        # not claimed by the worker, and runs again later
+        self._process(lambda moves: self.SyncJob._enqueue(self.invoice))
+        jobs = self._jobs()
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs.state, 'pending')
+        self.assertEqual(jobs.attempts, 0)
+
+    def test_failure_retried_with_backoff(self):
+        self.SyncJob._enqueue(self.invoice)
+
+        def sync(moves):
+            if self.invoice in moves:
+                raise UserError("Synchronization failed")
+
+        self._process(sync)
+        job = self._jobs()
+        self.assertEqual(len(job), 1, "a failing invoice should keep a single job")
+        self.assertRecordValues(job, [{'state': 'pending', 'attempts': 1, 'last_error': "Synchronization failed"}])
+        self.assertTrue(job.next_attempt)
+
+        # the job waits for its backoff
+        synced = self._process(sync)
+        self.assertNotIn(self.invoice.id, sum(synced, []))
+        self.assertEqual(job.attempts, 1)
+
+        # and is left failed after the last attempt
+        job.write({'attempts': MAX_ATTEMPTS - 1, 'next_attempt': False})
+        self._process(sync)
+        self.assertRecordValues(job, [{'state': 'failed', 'attempts': MAX_ATTEMPTS}])
+
+        job.action_retry()
+        self._process(lambda moves: None)
+        self.assertFalse(job.exists(), "a retried job should be done once synchronized")
@@ -1 +1,2 @@
-from . import assign_delivery_wizard
\ No newline at end of file
+from . import assign_delivery_wizard
+from . import delivery_collect_wizard
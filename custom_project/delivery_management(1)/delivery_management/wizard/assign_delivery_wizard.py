@@ -14,9 +14,20 @@ class AssignDeliveryWizard(models.TransientModel):
 
     def action_assign(self):
         active_ids = self.env.context.get('active_ids')
-        if active_ids:
-            records = self.env['delivery.management'].browse(active_ids)
-            for record in records:
-                record.delivery_boy = self.delivery_boy_id.id
-                record.write({'delivery_boy': self.delivery_boy_id.id})
-        return {'type': 'ir.actions.act_window_close'}
+        if not active_ids:
+            return {'type': 'ir.actions.act_window_close'}
+        records = self.env['delivery.management'].browse(active_ids)
+        summary = records.action_bulk_assign(self.delivery_boy_id.id)
+        message = "%s deliveries assigned to %s." % (summary['assigned'], self.delivery_boy_id.name)
+        if summary['skipped']:
+            message += " %s deliveries already on their way, closed or of another company were skipped." % summary['skipped']
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': "Delivery Assignment",
+                'message': message,
+                'type': 'warning' if summary['skipped'] else 'success',
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
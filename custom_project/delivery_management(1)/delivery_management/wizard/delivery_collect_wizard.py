@@ -0,0 +1,31 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+
+class DeliveryCollectWizard(models.TransientModel):
+    _name = 'delivery.collect.wizard'
+    _description = 'Delivery Collection Wizard'
+
+    delivery_id = fields.Many2one('delivery.management', string="Delivery", required=True)
+    amount_residual = fields.Monetary(related='delivery_id.amount_residual', string="Due Amount",
+                                      currency_field='due_currency_id')
+    due_currency_id = fields.Many2one(related='delivery_id.move_id.currency_id', string="Invoice Currency")
+    amount = fields.Monetary(string="Collected Amount", currency_field='currency_id', required=True,
+                             help="Cash actually handed over by the delivery boy")
+    currency_id = fields.Many2one('res.currency', string="Currency", required=True,
+                                  default=lambda self: self.env.company.currency_id)
+
+    @api.model
+    def default_get(self, fields_list):
+        values = super().default_get(fields_list)
+        delivery = self.env['delivery.management'].browse(values.get('delivery_id'))
+        if delivery.move_id.currency_id and 'currency_id' in fields_list:
+            values['currency_id'] = delivery.move_id.currency_id.id
+        return values
+
+    def action_collect(self):
+        self.ensure_one()
+        if self.currency_id.compare_amounts(self.amount, 0.0) <= 0:
+            raise UserError("Enter the amount collected by the delivery boy.")
+        self.delivery_id._collect(self.amount, self.currency_id)
+        return {'type': 'ir.actions.act_window_close'}
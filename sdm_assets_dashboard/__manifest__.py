@@ -1,10 +1,11 @@
 {
     'name': 'Assets Dashboard',
     'version': '17.0.0.0',
-    'depends': ['base', 'web','pways_equipment_all_in_one','maintenance',],
+    'depends': ['base', 'web', 'bus', 'hr', 'pways_equipment_all_in_one','maintenance',],
     'data': [
         'security/ir.model.access.csv',
         'security/assets_security.xml',
+        'data/ir_cron.xml',
         'views/menu.xml',
     ],
     'assets': {
@@ -0,0 +1,257 @@
+"""Benchmark and load-test harness for the assets dashboard RPC.
+
+Seeds synthetic camps, blocks, rooms, allocations and checklists into a
+local database, then calls the dashboard RPC repeatedly and reports p50 and
+p95 latency, SQL query count and peak Python memory.
+
+Usage, from the Odoo server directory::
+
+    python <path>/sdm_assets_dashboard/benchmark/dashboard_benchmark.py \\
+        -c odoo.conf -d bench_db --scale 100000 --runs 30
+
+The seeded data is rolled back at the end unless ``--keep`` is given; a kept
+dataset can be reused with ``--no-seed``. With ``--max-p95-ms`` and/or
+``--max-queries`` the script exits with status 1 when a threshold is
+exceeded, so it can be used as a regression gate.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import odoo
+from odoo.tools import config
+
+BATCH_SIZE = 1000
+
+# share of ``--scale`` seeded per model
+SCALE_RATIOS = {
+    'it.asset.allocation': 1.0,
+    'it.asset.checklist': 0.5,
+    'tools.asset.checklist': 0.5,
+    'camp.asset.checklist': 0.5,
+    'asset.allocation.request': 0.25,
+}
+BLOCKS_PER_CAMP = 5
+ROOMS_PER_BLOCK = 10
+ROWS_PER_CAMP = 1000
+
+
+# {model: {field: value}} of the required fields filled by _fill_required
+_required_values_cache = {}
+
+
+def _required_values(env, model, depth=0):
+    """ Return ``{field: value}`` for the required fields of ``model`` without
+    default, computed once per model: char fields map to ``None``, as they
+    are given a distinct value per record, and required many2one targets
+    are looked up (or created) once.
+    """
+    if model._name in _required_values_cache:
+        return _required_values_cache[model._name]
+    defaults = model.default_get(list(model._fields))
+    values = {}
+    for fname, field in model._fields.items():
+        if not field.required or fname in defaults or field.compute or field.related:
+            continue
+        if field.type in ('char', 'text', 'html'):
+            values[fname] = None
+        elif field.type == 'selection':
+            values[fname] = field.get_values(env)[0]
+        elif field.type in ('integer', 'float', 'monetary'):
+            values[fname] = 1
+        elif field.type == 'date':
+            values[fname] = date.today()
+        elif field.type == 'datetime':
+            values[fname] = datetime.now()
+        elif field.type == 'boolean':
+            values[fname] = False
+        elif field.type == 'many2one':
+            comodel = env[field.comodel_name]
+            record = comodel.search([], limit=1)
+            if not record and depth < 3:
+                record = comodel.create(_fill_required(env, comodel, {}, 0, depth + 1))
+            values[fname] = record.id
+    _required_values_cache[model._name] = values
+    return values
+
+
+def _fill_required(env, model, vals, index, depth=0):
+    """ Give a value to the required fields of ``model`` missing from
+    ``vals`` and without default, so that synthetic records can be created
+    whatever the source module requires.
+    """
+    for fname, value in _required_values(env, model, depth).items():
+        if fname not in vals:
+            vals[fname] = 'Bench %s %s' % (model._description, index) if value is None else value
+    return vals
+
+
+def _random_values(env, model, fname):
+    field = model._fields.get(fname)
+    if not field or field.type != 'selection':
+        return None
+    return field.get_values(env)
+
+
+def _create_batched(env, model, vals_list):
+    ids = []
+    for start in range(0, len(vals_list), BATCH_SIZE):
+        ids += model.create(vals_list[start:start + BATCH_SIZE]).ids
+        env.invalidate_all()
+    return ids
+
+
+def _spread_create_dates(env, model, ids, days=365):
+    env.cr.execute(
+        'UPDATE "%s" SET create_date = NOW() AT TIME ZONE \'UTC\' - random() * INTERVAL \'%s days\' '
+        'WHERE id = ANY(%%s)' % (model._table, days), [ids],
+    )
+
+
+def seed(env, scale):
+    """ Create a synthetic dataset proportional to ``scale``. """
+    room_model = env['camp.room']
+    block_model = env[room_model._fields['block_id'].comodel_name]
+    camp_model = env['camp.camp']
+
+    camp_count = max(1, scale // ROWS_PER_CAMP)
+    camp_ids = _create_batched(env, camp_model, [
+        _fill_required(env, camp_model, {'name': 'Bench Camp %s' % i}, i) for i in range(camp_count)
+    ])
+    block_ids = _create_batched(env, block_model, [
+        _fill_required(env, block_model, {'name': 'Bench Block %s' % i, 'camp_id': camp_id}, i)
+        for camp_id in camp_ids for i in range(BLOCKS_PER_CAMP)
+    ])
+    room_vals = []
+    for block_id in block_ids:
+        for i in range(ROOMS_PER_BLOCK):
+            vals = {'name': 'Bench Room %s' % i, 'block_id': block_id}
+            if 'capacity' in room_model._fields and not room_model._fields['capacity'].compute:
+                vals['capacity'] = random.randint(1, 8)
+            room_vals.append(_fill_required(env, room_model, vals, i))
+    _create_batched(env, room_model, room_vals)
+
+    for model_name, ratio in SCALE_RATIOS.items():
+        model = env[model_name]
+        status_field = 'state' if 'state' in model._fields else 'status'
+        statuses = _random_values(env, model, status_field)
+        vals_list = []
+        for i in range(int(scale * ratio)):
+            vals = {}
+            if statuses:
+                vals[status_field] = random.choice(statuses)
+            if 'allocation_date' in model._fields:
+                vals['allocation_date'] = datetime.now() - timedelta(days=random.randint(0, 365))
+            vals_list.append(_fill_required(env, model, vals, i))
+        ids = _create_batched(env, model, vals_list)
+        _spread_create_dates(env, model, ids)
+        print('seeded %s %s records' % (len(ids), model_name), file=sys.stderr)
+
+    env['assets.dashboard.snapshot'].action_reconcile()
+    env.invalidate_all()
+
+
+def measure(env, runs, method, args):
+    """ Call ``assets.dashboard.<method>`` ``runs`` times with cold caches
+    and return the latency (ms), query count and peak memory of each call.
+    """
+    from odoo.addons.sdm_assets_dashboard.models import assets_dashboard
+
+    dashboard = env['assets.dashboard']
+    samples = []
+    tracemalloc.start()
+    try:
+        for _run in range(runs):
+            assets_dashboard._widget_cache.clear()
+            env.invalidate_all()
+            tracemalloc.reset_peak()
+            queries = env.cr.sql_log_count
+            start = time.perf_counter()
+            getattr(dashboard, method)(*args)
+            elapsed = (time.perf_counter() - start) * 1000
+            samples.append({
+                'ms': elapsed,
+                'queries': env.cr.sql_log_count - queries,
+                'peak_kb': tracemalloc.get_traced_memory()[1] / 1024,
+            })
+    finally:
+        tracemalloc.stop()
+    return samples
+
+
+def summarize(samples):
+    latencies = sorted(sample['ms'] for sample in samples)
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    return {
+        'runs': len(samples),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(p95, 2),
+        'queries': max(sample['queries'] for sample in samples),
+        'peak_kb': round(max(sample['peak_kb'] for sample in samples), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-c', '--config', help="Odoo configuration file")
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument('--scale', type=int, default=10000,
+                        help="number of allocation rows to seed, e.g. 10000, 100000 or 1000000")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--days', type=int, default=30, help="history window of the dashboard")
+    parser.add_argument('--uid', type=int, default=odoo.SUPERUSER_ID,
+                        help="user running the dashboard, to include record rules")
+    parser.add_argument('--widgets', action='store_true', help="also measure every widget separately")
+    parser.add_argument('--no-seed', action='store_true', help="benchmark the existing data")
+    parser.add_argument('--keep', action='store_true', help="commit the seeded data")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--max-p95-ms', type=float, help="fail when get_tiles_data p95 exceeds it")
+    parser.add_argument('--max-queries', type=int, help="fail when get_tiles_data issues more queries")
+    args = parser.parse_args(argv)
+
+    config.parse_config((['-c', args.config] if args.config else []) + ['-d', args.database])
+    registry = odoo.modules.registry.Registry(args.database)
+    report = {'scale': None if args.no_seed else args.scale}
+    with registry.cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        if not args.no_seed:
+            seed(env, args.scale)
+        env = env(user=args.uid)
+        report['get_tiles_data'] = summarize(measure(env, args.runs, 'get_tiles_data', [args.days]))
+        if args.widgets:
+            for widget in env['assets.dashboard'].WIDGETS:
+                params = [args.days] if widget == 'history' else []
+                method = env['assets.dashboard'].WIDGETS[widget][0]
+                report[widget] = summarize(measure(env, args.runs, method, params))
+        if args.keep:
+            cr.commit()
+        else:
+            cr.rollback()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, stats in report.items():
+            if isinstance(stats, dict):
+                print('%-24s p50 %8.2f ms  p95 %8.2f ms  %4d queries  %10.1f KiB peak' % (
+                    name, stats['p50_ms'], stats['p95_ms'], stats['queries'], stats['peak_kb']))
+
+    tiles = report['get_tiles_data']
+    failures = []
+    if args.max_p95_ms is not None and tiles['p95_ms'] > args.max_p95_ms:
+        failures.append('p95 %.2f ms > %.2f ms' % (tiles['p95_ms'], args.max_p95_ms))
+    if args.max_queries is not None and tiles['queries'] > args.max_queries:
+        failures.append('%d queries > %d' % (tiles['queries'], args.max_queries))
+    if failures:
+        print('dashboard benchmark regression: %s' % ', '.join(failures), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
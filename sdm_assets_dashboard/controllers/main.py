@@ -0,0 +1,40 @@
+from werkzeug.exceptions import BadRequest
+
+from odoo import http
+from odoo.exceptions import UserError
+from odoo.http import request
+
+# query string parameters of the widgets, see assets.dashboard.WIDGET_PARAMS
+WIDGET_PARAMS = ('days', 'offset', 'limit')
+
+
+class AssetsDashboardController(http.Controller):
+
+    @http.route('/assets_dashboard/widget/<string:widget>', type='http', auth='user', methods=['GET'])
+    def widget_data(self, widget, cids=None, max_points=None, **kwargs):
+        """ Compact data of a dashboard widget, answered with ``304 Not
+        Modified`` when the client already holds the current version.
+        """
+        try:
+            params = {key: int(kwargs[key]) for key in WIDGET_PARAMS if kwargs.get(key)}
+            max_points = int(max_points) if max_points else None
+            company_ids = [int(cid) for cid in cids.split(',')] if cids else []
+        except ValueError:
+            raise BadRequest("Invalid dashboard widget parameters")
+
+        dashboard = request.env['assets.dashboard']
+        company_ids = [cid for cid in company_ids if cid in request.env.user.company_ids.ids]
+        if company_ids:
+            dashboard = dashboard.with_context(allowed_company_ids=company_ids)
+
+        try:
+            dashboard._check_widget_params(widget, params)
+            etag = dashboard.get_widget_etag(widget, dict(params, max_points=max_points))
+            headers = [('ETag', '"%s"' % etag), ('Cache-Control', 'private, no-cache')]
+            if request.httprequest.if_none_match.contains(etag):
+                return request.make_response(b'', headers=headers, status=304)
+            data = dashboard.get_widget_data(widget, **params)
+        except UserError as e:
+            raise BadRequest(str(e))
+        return request.make_json_response(
+            dashboard._compact_widget_data(widget, data, max_points), headers=headers)
@@ -1 +1,8 @@
 from . import assets_dashboard
+from . import dashboard_histogram
+from . import dashboard_snapshot
+from . import dashboard_sources
+from . import dashboard_occupancy
+from . import dashboard_status
+from . import dashboard_filter
+from . import ir_websocket
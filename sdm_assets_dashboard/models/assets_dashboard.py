@@ -1,5 +1,22 @@
+import hashlib
+import json
+import time
+
 from odoo import models, api
-from datetime import datetime, date, timedelta
+from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools.safe_eval import safe_eval
+from datetime import datetime, date
+
+from .dashboard_chart import to_columns, downsample_lttb
+
+HISTORY_WINDOWS = (7, 30, 90, 365)
+CAMP_PAGE_SIZE = 20
+
+# {(dbname, widget, uid, company_ids, params): (expiry, data)}, per worker
+_widget_cache = {}
+WIDGET_CACHE_SIZE = 2048
+
 
 class AssetsDashboard(models.Model):
     _name = 'assets.dashboard'
@@ -8,168 +25,314 @@ class AssetsDashboard(models.Model):
     @api.model
     def get_user_group_info(self):
         user = self.env.user
+        department = self._get_dashboard_department()
         return {
             'is_manager': user.has_group('sdm_assets_dashboard.group_manager_access'),
             'is_department': user.has_group('sdm_assets_dashboard.group_department_access'),
+            'bus_channels': self._get_bus_channels(),
+            # False for a global dashboard, 0 for a department user without department
+            'scope_department_id': False if department is None else department.id or 0,
         }
 
     @api.model
-    def get_tiles_data(self):
+    def _get_dashboard_department(self):
+        """ Return the department the dashboard of the current user is
+        restricted to (possibly empty), or ``None`` for a global dashboard.
+        """
+        user = self.env.user
+        if user.has_group('sdm_assets_dashboard.group_manager_access') \
+                or not user.has_group('sdm_assets_dashboard.group_department_access'):
+            return None
+        return user.employee_id.department_id
 
+    @api.model
+    def _get_bus_channels(self):
+        """ Bus channels of the snapshot deltas the dashboard of the current
+        user shows: one per department it covers, in the current company
+        and for the records without company.
+        """
+        snapshot = self.env['assets.dashboard.snapshot']
+        department = self._get_dashboard_department()
+        if department is None:
+            department_ids = [0] + self.env['hr.department'].sudo().with_context(active_test=False).search([
+                ('company_id', 'in', [False, self.env.company.id]),
+            ]).ids
+        elif department:
+            department_ids = [department.id]
+        else:
+            return []
+        return [
+            snapshot._bus_channel(company_id, department_id)
+            for company_id in (0, self.env.company.id)
+            for department_id in department_ids
+        ]
 
-        today = date.today()
-        start_datetime = datetime.combine(today, datetime.min.time())
-        end_datetime = datetime.combine(today, datetime.max.time())
+    @api.model
+    def _check_bus_channel(self, channel):
+        """ Whether the current user may listen to the snapshot deltas of
+        ``channel``, a channel of the snapshot.
+        """
+        company_id, department_id = self.env['assets.dashboard.snapshot']._parse_bus_channel(channel)
+        user = self.env.user
+        if not user._is_internal() or (company_id and company_id not in user.company_ids.ids):
+            return False
+        department = self._get_dashboard_department()
+        return department is None or bool(department) and department.id == department_id
 
-        # All rooms data
-        all_rooms = self.env['camp.room'].search([])
-        total_vacant_slots = sum(all_rooms.mapped('vacant_slots'))
+    @api.model
+    def _department_domain(self, model_name):
+        """ Domain restricting ``model_name`` to the dashboard's department. """
+        department = self._get_dashboard_department()
+        if department is None:
+            return []
+        field = self.env[model_name]._fields.get('department_id')
+        if department and field and field.type == 'many2one' and field.comodel_name == 'hr.department':
+            return [('department_id', '=', department.id)]
+        return expression.FALSE_DOMAIN
 
-        # If total capacity field exists, calculate allocated rooms
-        total_capacity = sum(all_rooms.mapped('capacity')) if 'capacity' in all_rooms._fields else 0
-        total_allocated_slots = total_capacity - total_vacant_slots if total_capacity else 0
+    @api.model
+    def _has_record_rules(self, model_name):
+        """ Whether record rules other than the multi-company ones restrict the
+        records of ``model_name`` the current user may read.
+        """
+        if self.env.su:
+            return False
+        for rule in self.env['ir.rule'].sudo()._get_rules(model_name):
+            domain = safe_eval(rule.domain_force, rule._eval_context()) if rule.domain_force else []
+            if any(
+                expression.is_leaf(leaf) and isinstance(leaf[0], str) and leaf[0].split('.')[0] != 'company_id'
+                for leaf in domain
+            ):
+                return True
+        return False
 
-        # Tile: IT asset allocations today
-        allocations_today = self.env['it.asset.allocation'].search_count([
-            ('allocation_date', '>=', start_datetime),
-            ('allocation_date', '<=', end_datetime),
-        ])
+    @api.model
+    def _snapshot_counts(self, model_name):
+        """ Status counts of ``model_name`` in the current companies, read from
+        the snapshot, from the per-department partial aggregates for
+        department users.
+
+        The snapshot only honours the company scope: when other record rules
+        apply to the user, the records are counted live instead.
+        """
+        department = self._get_dashboard_department()
+        if department is not None and not department:
+            return {}
+        if self._has_record_rules(model_name):
+            model = self.env[model_name]
+            return {
+                status: count
+                for status, count in model._read_group(
+                    self._department_domain(model_name), [model._dashboard_status_field], ['__count'])
+                if status
+            }
+        return self.env['assets.dashboard.snapshot'].get_status_counts(department=department)[model_name]
 
-        # Tile: Tool/Equipment allocations today
-        tools_allocations_today = self.env['tools.equipment.allocation'].search_count([
-            ('allocation_date', '>=', start_datetime),
-            ('allocation_date', '<=', end_datetime),
-        ])
+    @api.model
+    def get_history_data(self, days=30):
+        """ Daily allocation and checklist counts over the ``days`` last days. """
+        if days not in HISTORY_WINDOWS:
+            raise UserError("The dashboard history window must be one of %s days." % (HISTORY_WINDOWS,))
+        histogram = self.env['assets.dashboard.histogram']
+        return {
+            'history_days': days,
+            'last_30_days_data': histogram.get_last_days_histogram(
+                'it.asset.allocation', 'create_date', days,
+                domain=self._department_domain('it.asset.allocation')),
+            'last_30_days_checklist_data': histogram.get_last_days_histogram(
+                'it.asset.checklist', 'create_date', days,
+                domain=self._department_domain('it.asset.checklist')),
+        }
 
-        department = self.env['asset.allocation.request'].read_group(
-            domain=[],
-            fields=['state'],
-            groupby=['state'],
-            lazy=False
-        )
-        department_allocation = {r['state']: r['__count'] for r in department}
-
-        # ---- IT Asset Allocation ----
-        allocations = self.env['it.asset.allocation'].read_group(
-            domain=[],
-            fields=['state'],
-            groupby=['state'],
-            lazy=False
-        )
-        allocation_graph = {r['state']: r['__count'] for r in allocations}
-
-        # ---- IT Asset Checklist ----
-        checklists = self.env['it.asset.checklist'].read_group(
-            domain=[],
-            fields=['status'],
-            groupby=['status'],
-            lazy=False
-        )
-        checklist_graph = {r['status']: r['__count'] for r in checklists}
-
-        # ---- Tools Checklist ----
-        tools_checklists = self.env['tools.asset.checklist'].read_group(
-            domain=[],
-            fields=['status'],
-            groupby=['status'],
-            lazy=False
-        )
-        tools_checklist_graph = {r['status']: r['__count'] for r in tools_checklists}
-
-        # ---- Camp Checklist ----
-        camp_checklist = self.env['camp.asset.checklist'].read_group(
-            domain=[],
-            fields=['status'],
-            groupby=['status'],
-            lazy=False
-        )
-        camp_checklist_graph = {r['status']: r['__count'] for r in camp_checklist}
-
-        # ---- Last 30 days allocation ----
-        last_30_days_data = {}
-        for i in range(30):
-            day = today - timedelta(days=i)
-            start = datetime.combine(day, datetime.min.time())
-            end = datetime.combine(day, datetime.max.time())
-
-            count = self.env['it.asset.allocation'].search_count([
-                ('create_date', '>=', start),
-                ('create_date', '<=', end),
-            ])
-            last_30_days_data[day.strftime('%Y-%m-%d')] = count
-        last_30_days_data = dict(sorted(last_30_days_data.items()))
-
-        # ---- Last 30 days checklist ----
-        last_30_days_checklist_data = {}
-        for i in range(30):
-            day = today - timedelta(days=i)
-            start = datetime.combine(day, datetime.min.time())
-            end = datetime.combine(day, datetime.max.time())
-
-            count = self.env['it.asset.checklist'].search_count([
-                ('create_date', '>=', start),
-                ('create_date', '<=', end),
-            ])
-            last_30_days_checklist_data[day.strftime('%Y-%m-%d')] = count
-        last_30_days_checklist_data = dict(sorted(last_30_days_checklist_data.items()))
-
-        # ---- Allocated vs Vacant for Donut Chart ----
-        allocated_vs_vacant_data = [
-            {"label": "Allocated", "value": total_allocated_slots},
-            {"label": "Vacant", "value": total_vacant_slots}
-        ]
+    # widget name: (method, cache time-to-live in seconds)
+    WIDGETS = {
+        'rooms': ('_widget_rooms', 60),
+        'today': ('_widget_today', 60),
+        'allocations': ('_widget_allocations', 30),
+        'checklists': ('_widget_checklists', 30),
+        'tools_checklists': ('_widget_tools_checklists', 30),
+        'camp_checklists': ('_widget_camp_checklists', 30),
+        'department_requests': ('_widget_department_requests', 30),
+        'history': ('_widget_history', 300),
+        'camp_occupancy': ('_widget_camp_occupancy', 300),
+    }
+    # widget name: parameters its method accepts, none for the others
+    WIDGET_PARAMS = {
+        'history': ('days',),
+        'camp_occupancy': ('offset', 'limit'),
+    }
+
+    # widgets computed from assets.dashboard.snapshot only; they change
+    # exactly when the snapshot does, the others within their time-to-live
+    SNAPSHOT_WIDGETS = (
+        'allocations', 'checklists', 'tools_checklists', 'camp_checklists', 'department_requests',
+    )
+
+    # widget: {chart series: label key of its records, None for a {label: value} dict}
+    CHART_SERIES = {
+        'allocations': {'graph_data': None},
+        'checklists': {'check_list_graph_data': None},
+        'tools_checklists': {'tools_check_list_graph_data': None},
+        'camp_checklists': {'camp_checklist_graph_data': None},
+        'department_requests': {'department_allocated_graph_data': None},
+        'history': {'last_30_days_data': None, 'last_30_days_checklist_data': None},
+        'camp_occupancy': {'stacked_bar_data': 'camp'},
+    }
+    # widgets whose series are time series, which may be downsampled
+    TIME_SERIES_WIDGETS = ('history',)
 
-        stacked_bar_data = []
-        room_model = self.env['camp.room']
-        has_capacity = 'capacity' in room_model._fields
-        has_vacant = 'vacant_slots' in room_model._fields
+    @api.model
+    def _check_widget_params(self, widget, params):
+        if widget not in self.WIDGETS:
+            raise UserError("Unknown dashboard widget: %s" % widget)
+        unknown = set(params or ()) - set(self.WIDGET_PARAMS.get(widget, ()))
+        if unknown:
+            raise UserError("Unknown parameters for dashboard widget %s: %s" % (widget, ', '.join(sorted(unknown))))
 
-        camps = self.env['camp.camp'].search([])
-        for camp in camps:
-            rooms = room_model.search([('block_id.camp_id', '=', camp.id)])
+    @api.model
+    def _widget_version(self, widget):
+        if widget not in self.WIDGETS:
+            raise UserError("Unknown dashboard widget: %s" % widget)
+        if widget in self.SNAPSHOT_WIDGETS:
+            return self.env['assets.dashboard.snapshot']._get_version()
+        return '%s/%s' % (date.today().isoformat(), int(time.time() // self.WIDGETS[widget][1]))
 
-            camp_capacity = sum(rooms.mapped('capacity')) if has_capacity else 0
-            camp_vacant = sum(rooms.mapped('vacant_slots')) if has_vacant else 0
-            camp_allocated = camp_capacity - camp_vacant if camp_capacity else 0
+    @api.model
+    def get_widget_etag(self, widget, params=None):
+        """ Return the entity tag of the data of ``widget`` for ``params``,
+        which only changes when that data may have changed.
+        """
+        key = repr((
+            self.env.cr.dbname, widget, self.env.uid, self.env.companies.ids,
+            json.dumps(params or {}, sort_keys=True), self._widget_version(widget),
+        ))
+        return hashlib.sha1(key.encode()).hexdigest()
 
-            stacked_bar_data.append({
-                "camp": camp.name,
-                "allocated": camp_allocated,
-                "vacant": camp_vacant
-            })
+    @api.model
+    def get_widget_data(self, widget, **params):
+        """ Return the data of a single dashboard ``widget``, served from a
+        per-widget cache for the widget's time-to-live, or until the snapshot
+        changes for the widgets computed from it.
+        """
+        self._check_widget_params(widget, params)
+        method, ttl = self.WIDGETS[widget]
+        key = (
+            self.env.cr.dbname, widget, self.env.uid, tuple(self.env.companies.ids),
+            json.dumps(params, sort_keys=True), self._widget_version(widget),
+        )
+        now = time.monotonic()
+        cached = _widget_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+        data = getattr(self, method)(**params)
+        if len(_widget_cache) >= WIDGET_CACHE_SIZE:
+            for stale_key in [k for k, (expiry, _data) in _widget_cache.items() if expiry <= now]:
+                _widget_cache.pop(stale_key, None)
+            if len(_widget_cache) >= WIDGET_CACHE_SIZE:
+                _widget_cache.clear()
+        _widget_cache[key] = (now + ttl, data)
+        return data
 
+    @api.model
+    def _compact_widget_data(self, widget, data, max_points=None):
+        """ Encode the chart series of ``data`` as parallel label and value
+        arrays, downsampling time series to ``max_points`` points.
+        """
+        data = dict(data)
+        for key, label_key in self.CHART_SERIES.get(widget, {}).items():
+            if key not in data:
+                continue
+            columns = to_columns(data[key], label_key)
+            if max_points and widget in self.TIME_SERIES_WIDGETS and 'values' in columns:
+                columns['labels'], columns['values'] = downsample_lttb(
+                    columns['labels'], columns['values'], max_points)
+            data[key] = columns
+        return data
+
+    @api.model
+    def _widget_rooms(self):
+        # vacant_slots is a stored compute, written without write(): it is
+        # read live rather than kept in the snapshot, along with the capacity
+        # so that both cover the same rooms
+        rooms = self.env['camp.room']
+        aggregates = ['vacant_slots:sum'] + (['capacity:sum'] if 'capacity' in rooms._fields else [])
+        [totals] = rooms._read_group(self._department_domain('camp.room'), [], aggregates)
+        total_vacant_slots = int(totals[0] or 0)
+        # If total capacity field exists, calculate allocated rooms
+        total_capacity = int(totals[1] or 0) if len(totals) > 1 else 0
+        total_allocated_slots = total_capacity - total_vacant_slots if total_capacity else 0
         return {
             'total_vacant_slots': total_vacant_slots,
-            'today_allocations': allocations_today,
-            'today_tools_allocations': tools_allocations_today,
+            # Donut Chart Data
+            'allocated_vs_vacant_data': [
+                {"label": "Allocated", "value": total_allocated_slots},
+                {"label": "Vacant", "value": total_vacant_slots}
+            ],
+        }
+
+    @api.model
+    def _widget_today(self):
+        today = date.today()
+        start_datetime = datetime.combine(today, datetime.min.time())
+        end_datetime = datetime.combine(today, datetime.max.time())
+        domain = [
+            ('allocation_date', '>=', start_datetime),
+            ('allocation_date', '<=', end_datetime),
+        ]
+        return {
+            'today_allocations': self.env['it.asset.allocation'].search_count(
+                domain + self._department_domain('it.asset.allocation')),
+            'today_tools_allocations': self.env['tools.equipment.allocation'].search_count(
+                domain + self._department_domain('tools.equipment.allocation')),
+        }
 
-            # Allocation Data
+    @api.model
+    def _widget_allocations(self):
+        allocation_graph = self._snapshot_counts('it.asset.allocation')
+        return {
             'total': sum(allocation_graph.values()),
             'allocated': allocation_graph.get('allocated', 0),
             'returned': allocation_graph.get('returned', 0),
             'draft': allocation_graph.get('draft', 0),
             'graph_data': allocation_graph,
+        }
 
-            # IT Asset Checklist
+    @api.model
+    def _widget_checklists(self):
+        checklist_graph = self._snapshot_counts('it.asset.checklist')
+        return {
             'checklist_pending': checklist_graph.get('pending', 0),
             'checklist_verified': checklist_graph.get('verified', 0),
             'checklist_escalated': checklist_graph.get('escalated', 0),
             'check_list_graph_data': checklist_graph,
+        }
 
-            # Tools Asset Checklist
+    @api.model
+    def _widget_tools_checklists(self):
+        tools_checklist_graph = self._snapshot_counts('tools.asset.checklist')
+        return {
             'tools_pending': tools_checklist_graph.get('pending', 0),
             'tools_verified': tools_checklist_graph.get('verified', 0),
             'tools_escalated': tools_checklist_graph.get('escalated', 0),
             'tools_reset': tools_checklist_graph.get('reset', 0),
             'tools_check_list_graph_data': tools_checklist_graph,
+        }
 
-            # Camp Checklists
+    @api.model
+    def _widget_camp_checklists(self):
+        camp_checklist_graph = self._snapshot_counts('camp.asset.checklist')
+        return {
             'camp_pending': camp_checklist_graph.get('pending', 0),
             'camp_verified': camp_checklist_graph.get('verified', 0),
             'camp_escalated': camp_checklist_graph.get('escalated', 0),
             'camp_reset': camp_checklist_graph.get('reset', 0),
             'camp_checklist_graph_data': camp_checklist_graph,
+        }
 
+    @api.model
+    def _widget_department_requests(self):
+        department_allocation = self._snapshot_counts('asset.allocation.request')
+        return {
             # 'department_total':sum(department_allocation.values()),
             'department_new': department_allocation.get('new', 0),
             'department_created': department_allocation.get('created', 0),
@@ -179,13 +342,33 @@ class AssetsDashboard(models.Model):
             'department_returned': department_allocation.get('returned', 0),
             'department_rejected': department_allocation.get('rejected', 0),
             'department_allocated_graph_data': department_allocation,
+        }
 
-            # Historical Data
-            'last_30_days_checklist_data': last_30_days_checklist_data,
-            'last_30_days_data': last_30_days_data,
+    @api.model
+    def _widget_history(self, days=30):
+        return self.get_history_data(days)
 
-            # Donut Chart Data
-            'allocated_vs_vacant_data': allocated_vs_vacant_data,
-            'stacked_bar_data': stacked_bar_data
+    @api.model
+    def _widget_camp_occupancy(self, offset=0, limit=CAMP_PAGE_SIZE):
+        occupancy = self.env['assets.dashboard.occupancy'].get_camp_occupancy(offset=offset, limit=limit)
+        return {
+            'stacked_bar_data': [{
+                "camp": camp['camp'],
+                "allocated": camp['allocated'],
+                "vacant": camp['vacant'],
+            } for camp in occupancy['records']],
+            'camp_total': occupancy['total'],
+            'camp_offset': offset,
+            'camp_page_size': limit,
         }
 
+    @api.model
+    def get_tiles_data(self, days=30):
+        """ All the widgets at once, kept for backward compatibility; the
+        dashboard itself loads each widget through :meth:`get_widget_data`.
+        """
+        data = {}
+        for widget, (method, _ttl) in self.WIDGETS.items():
+            params = {'days': days} if widget == 'history' else {}
+            data.update(getattr(self, method)(**params))
+        return data
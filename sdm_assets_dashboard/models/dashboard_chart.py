@@ -0,0 +1,61 @@
+""" Compact encoding of the dashboard chart series.
+
+Series are shipped as parallel arrays (``{'labels': [...], 'values': [...]}``)
+rather than dicts keyed by label, which is both smaller and the shape
+Chart.js consumes directly.
+"""
+
+
+def to_columns(series, label_key=None):
+    """ Convert ``series`` to parallel arrays.
+
+    :param series: either a ``{label: value}`` dict, or a list of records
+        (dicts) labelled by their ``label_key`` value
+    :return: ``{'labels': [...], 'values': [...]}`` for a dict, and
+        ``{'labels': [...], <key>: [...], ...}`` with one array per other key
+        of the records for a list
+    """
+    if isinstance(series, dict):
+        return {'labels': list(series), 'values': list(series.values())}
+    columns = {'labels': [record[label_key] for record in series]}
+    for key in (series[0] if series else ()):
+        if key != label_key:
+            columns[key] = [record.get(key) or 0 for record in series]
+    return columns
+
+
+def downsample_lttb(labels, values, threshold):
+    """ Reduce a time series to ``threshold`` points with the Largest
+    Triangle Three Buckets algorithm, which keeps the visual shape (peaks and
+    troughs) of the series. Points are assumed evenly spaced, as the buckets
+    of a histogram are.
+
+    :return: ``(labels, values)`` of the selected points
+    """
+    size = len(values)
+    if not threshold or threshold < 3 or threshold >= size:
+        return list(labels), list(values)
+
+    selected = [0]
+    bucket_size = (size - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        # the third vertex is the average point of the next bucket
+        next_end = max(min(int((bucket + 2) * bucket_size) + 1, size), end + 1)
+        next_x = (end + next_end - 1) / 2
+        next_y = sum(values[end:next_end]) / (next_end - end)
+
+        best, best_area = start, -1
+        for index in range(start, end):
+            area = abs(
+                (previous - next_x) * (values[index] - values[previous])
+                - (previous - index) * (next_y - values[previous])
+            )
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        previous = best
+    selected.append(size - 1)
+    return [labels[index] for index in selected], [values[index] for index in selected]
@@ -0,0 +1,110 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from datetime import datetime, timedelta
+
+DRILLDOWN_LIMIT = 80
+
+
+class DashboardFilter(models.AbstractModel):
+    _name = 'assets.dashboard.filter'
+    _description = 'Assets Dashboard Filtered Aggregates'
+
+    # model: (date field, status field); both are covered by a composite
+    # index declared on the model, see dashboard_sources.py
+    FILTER_SOURCES = {
+        'it.asset.allocation': ('allocation_date', 'state'),
+        'tools.equipment.allocation': ('allocation_date', 'state'),
+        'asset.allocation.request': ('create_date', 'state'),
+        'it.asset.checklist': ('create_date', 'status'),
+        'tools.asset.checklist': ('create_date', 'status'),
+        'camp.asset.checklist': ('create_date', 'status'),
+    }
+
+    # candidate paths from a record to its camp and block, first match wins
+    CAMP_PATHS = ('camp_id', 'block_id.camp_id', 'room_id.block_id.camp_id')
+    BLOCK_PATHS = ('block_id', 'room_id.block_id')
+
+    @api.model
+    def _resolve_path(self, model, paths):
+        """ Return the first of ``paths`` that exists on ``model``. """
+        for path in paths:
+            current = model
+            for fname in path.split('.'):
+                field = current._fields.get(fname)
+                if not field or field.type != 'many2one':
+                    break
+                current = self.env[field.comodel_name]
+            else:
+                return path
+        return None
+
+    @api.model
+    def _date_domain(self, model, date_field, date_from, date_to):
+        domain = []
+        is_datetime = model._fields[date_field].type == 'datetime'
+        if date_from:
+            date_from = fields.Date.to_date(date_from)
+            lower = datetime.combine(date_from, datetime.min.time()) if is_datetime else date_from
+            domain.append((date_field, '>=', lower))
+        if date_to:
+            upper = fields.Date.to_date(date_to) + timedelta(days=1)
+            if is_datetime:
+                upper = datetime.combine(upper, datetime.min.time())
+            domain.append((date_field, '<', upper))
+        return domain
+
+    @api.model
+    def get_filtered_data(self, date_from=None, date_to=None, camp_id=None, block_id=None,
+                          status=None, model_names=None, limit=DRILLDOWN_LIMIT):
+        """ Aggregate the dashboard sources over an arbitrary date range,
+        camp, block and/or status.
+
+        Models that cannot be related to the requested camp or block are
+        left out of the result.
+
+        :return: ``{model: {'count': n, 'statuses': {status: count},
+            'record_ids': [first ``limit`` matching ids]}}``
+        """
+        if date_from and date_to and fields.Date.to_date(date_from) > fields.Date.to_date(date_to):
+            raise UserError("The start date must be before the end date.")
+        dashboard = self.env['assets.dashboard']
+        result = {}
+        for model_name in model_names or self.FILTER_SOURCES:
+            if model_name not in self.FILTER_SOURCES:
+                raise UserError("Unsupported dashboard model: %s" % model_name)
+            model = self.env[model_name]
+            date_field, status_field = self.FILTER_SOURCES[model_name]
+            if status_field not in model._fields:
+                status_field = None
+
+            domain = self._date_domain(model, date_field, date_from, date_to)
+            if camp_id:
+                path = self._resolve_path(model, self.CAMP_PATHS)
+                if not path:
+                    continue
+                domain.append((path, '=', camp_id))
+            if block_id:
+                path = self._resolve_path(model, self.BLOCK_PATHS)
+                if not path:
+                    continue
+                domain.append((path, '=', block_id))
+            if status:
+                if not status_field:
+                    continue
+                domain.append((status_field, '=', status))
+            domain += dashboard._department_domain(model_name)
+
+            if status_field:
+                groups = model._read_group(domain, [status_field], ['__count'])
+                statuses = {value: value_count for value, value_count in groups if value}
+                count = sum(value_count for _value, value_count in groups)
+            else:
+                statuses = {}
+                count = model.search_count(domain)
+            result[model_name] = {
+                'count': count,
+                'statuses': statuses,
+                'record_ids': model.search(domain, limit=limit, order='%s desc, id desc' % date_field).ids
+                if count else [],
+            }
+        return result
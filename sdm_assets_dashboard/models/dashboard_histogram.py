@@ -0,0 +1,83 @@
+from odoo import models, api
+from odoo.exceptions import UserError
+from datetime import date, datetime, timedelta
+
+
+class DashboardHistogram(models.AbstractModel):
+    _name = 'assets.dashboard.histogram'
+    _description = 'Assets Dashboard Date Histogram'
+
+    INTERVALS = ('day', 'week', 'month')
+
+    @api.model
+    def _bucket_start(self, day, interval):
+        """ Return the first day of the bucket containing ``day``, using the
+        same boundaries as PostgreSQL's ``date_trunc`` (weeks start on Monday).
+        """
+        if interval == 'week':
+            return day - timedelta(days=day.weekday())
+        if interval == 'month':
+            return day.replace(day=1)
+        return day
+
+    @api.model
+    def _next_bucket(self, day, interval):
+        if interval == 'week':
+            return day + timedelta(days=7)
+        if interval == 'month':
+            return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return day + timedelta(days=1)
+
+    @api.model
+    def get_histogram(self, model_name, date_field, date_from, date_to, interval='day', domain=None):
+        """ Count the records of ``model_name`` per ``interval`` bucket of
+        ``date_field`` between ``date_from`` and ``date_to`` (both included).
+
+        The whole range is computed with a single grouped query; buckets
+        without any record are zero-filled.
+
+        :return: ordered dict ``{'YYYY-MM-DD': count}`` keyed by bucket start
+        """
+        if interval not in self.INTERVALS:
+            raise UserError("Unsupported histogram interval: %s" % interval)
+
+        model = self.env[model_name].with_context(tz='UTC')
+        field = model._fields[date_field]
+
+        if field.type == 'datetime':
+            lower = datetime.combine(date_from, datetime.min.time())
+            upper = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+        else:
+            lower, upper = date_from, date_to + timedelta(days=1)
+
+        groups = model._read_group(
+            domain=list(domain or []) + [
+                (date_field, '>=', lower),
+                (date_field, '<', upper),
+            ],
+            groupby=['%s:%s' % (date_field, interval)],
+            aggregates=['__count'],
+        )
+        counts = {}
+        for bucket, count in groups:
+            if not bucket:
+                continue
+            if isinstance(bucket, datetime):
+                bucket = bucket.date()
+            counts[bucket] = count
+
+        histogram = {}
+        bucket = self._bucket_start(date_from, interval)
+        while bucket <= date_to:
+            histogram[bucket.strftime('%Y-%m-%d')] = counts.get(bucket, 0)
+            bucket = self._next_bucket(bucket, interval)
+        return histogram
+
+    @api.model
+    def get_last_days_histogram(self, model_name, date_field, days, interval='day', domain=None):
+        """ Histogram over the ``days`` last days, today included. """
+        today = date.today()
+        return self.get_histogram(
+            model_name, date_field, today - timedelta(days=days - 1), today,
+            interval=interval, domain=domain,
+        )
@@ -0,0 +1,144 @@
+from odoo import models, api
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+
+class DashboardOccupancy(models.AbstractModel):
+    _name = 'assets.dashboard.occupancy'
+    _description = 'Assets Dashboard Camp Occupancy'
+
+    SORT_KEYS = ('name', 'capacity', 'allocated', 'vacant')
+
+    @api.model
+    def _room_column(self, fname):
+        """ SQL expression summing the room field ``fname``, 0 when the
+        field does not exist or is not stored.
+        """
+        field = self.env['camp.room']._fields.get(fname)
+        if not field or not field.store:
+            return SQL("0")
+        return SQL("COALESCE(SUM(room.%s), 0)", SQL.identifier(fname))
+
+    @api.model
+    def _parse_order(self, order):
+        key, _sep, direction = (order or 'name').strip().partition(' ')
+        direction = direction.strip().lower() or 'asc'
+        if key not in self.SORT_KEYS or direction not in ('asc', 'desc'):
+            raise UserError("Invalid camp occupancy order: %s" % order)
+        return key, direction
+
+    @api.model
+    def get_camp_occupancy(self, offset=0, limit=None, order='name', by_block=False):
+        """ Return the capacity, allocated and vacant slots of each camp
+        (and, with ``by_block``, of each of its blocks), computed with one
+        grouped query over the rooms.
+
+        :param order: ``'<name|capacity|allocated|vacant> [asc|desc]'``
+        :return: ``{'total': <number of camps>, 'records': [...]}``
+        """
+        key, direction = self._parse_order(order)
+        camp_model = self.env['camp.camp']
+        room_model = self.env['camp.room']
+        block_model = self.env[room_model._fields['block_id'].comodel_name]
+        capacity = self._room_column('capacity')
+        vacant = self._room_column('vacant_slots')
+        # only the blocks and rooms the user may read are counted
+        from_clause = SQL(
+            """
+                 FROM %s camp
+            LEFT JOIN %s block ON block.camp_id = camp.id AND block.id IN %s
+            LEFT JOIN %s room ON room.block_id = block.id AND room.id IN %s
+            """,
+            SQL.identifier(camp_model._table),
+            SQL.identifier(block_model._table),
+            block_model._search([]).subselect(),
+            SQL.identifier(room_model._table),
+            room_model._search([]).subselect(),
+        )
+
+        if key == 'name':
+            camp_ids = camp_model.search([], order='name %s' % direction, offset=offset, limit=limit).ids
+            where_clause = SQL("camp.id = ANY(%s)", camp_ids)
+            order_clause = SQL("camp.id")
+            page_clause = SQL()
+        else:
+            # let the database sort on the aggregate, restricted to the camps
+            # the user may read
+            camp_ids = None
+            where_clause = SQL("camp.id IN %s", camp_model._search([]).subselect())
+            sort_expr = {
+                'capacity': capacity,
+                'vacant': vacant,
+                'allocated': SQL("(%s - %s)", capacity, vacant),
+            }[key]
+            order_clause = SQL("%s %s, camp.id", sort_expr, SQL(direction.upper()))
+            page_clause = SQL("LIMIT %s OFFSET %s", limit, offset) if limit else SQL("OFFSET %s", offset)
+
+        self.env.cr.execute(SQL(
+            """
+            SELECT camp.id, %(capacity)s, %(vacant)s
+            %(tables)s
+             WHERE %(where)s
+          GROUP BY camp.id
+          ORDER BY %(order)s
+            %(page)s
+            """,
+            capacity=capacity,
+            vacant=vacant,
+            tables=from_clause,
+            where=where_clause,
+            order=order_clause,
+            page=page_clause,
+        ))
+        rows = {camp_id: (cap, vac) for camp_id, cap, vac in self.env.cr.fetchall()}
+        if camp_ids is None:
+            camp_ids = list(rows)
+
+        camps = camp_model.browse(camp_ids)
+        names = {camp.id: camp.display_name for camp in camps}
+        records = []
+        for camp_id in camp_ids:
+            camp_capacity, camp_vacant = rows.get(camp_id, (0, 0))
+            records.append({
+                'camp_id': camp_id,
+                'camp': names[camp_id],
+                'capacity': camp_capacity,
+                'allocated': camp_capacity - camp_vacant if camp_capacity else 0,
+                'vacant': camp_vacant,
+            })
+
+        if by_block and camp_ids:
+            blocks = self._get_block_occupancy(camp_ids, from_clause, capacity, vacant)
+            for record in records:
+                record['blocks'] = blocks.get(record['camp_id'], [])
+
+        return {
+            'total': camp_model.search_count([]),
+            'records': records,
+        }
+
+    @api.model
+    def _get_block_occupancy(self, camp_ids, from_clause, capacity, vacant):
+        self.env.cr.execute(SQL(
+            """
+            SELECT camp.id, block.id, %s, %s
+            %s
+             WHERE camp.id = ANY(%s) AND block.id IS NOT NULL
+          GROUP BY camp.id, block.id
+          ORDER BY camp.id, block.id
+            """,
+            capacity, vacant, from_clause, camp_ids,
+        ))
+        rows = self.env.cr.fetchall()
+        block_model = self.env[self.env['camp.room']._fields['block_id'].comodel_name]
+        names = {block.id: block.display_name for block in block_model.browse([row[1] for row in rows])}
+        blocks = {}
+        for camp_id, block_id, block_capacity, block_vacant in rows:
+            blocks.setdefault(camp_id, []).append({
+                'block_id': block_id,
+                'block': names[block_id],
+                'capacity': block_capacity,
+                'allocated': block_capacity - block_vacant if block_capacity else 0,
+                'vacant': block_vacant,
+            })
+        return blocks
@@ -0,0 +1,320 @@
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+
+NOTIFICATION_KEY = 'assets.dashboard.snapshot.deltas'
+BUS_CHANNEL_PREFIX = 'assets_dashboard_'
+
+
+def create_dashboard_indexes(model, indexes=None):
+    """ Create the composite indexes ``indexes`` (defaults to the model's
+    ``_dashboard_indexes``) whose columns all exist on ``model``. The column
+    filtered by equality comes first, then the one filtered by range.
+    """
+    for fnames in indexes or model._dashboard_indexes:
+        if all(fname in model._fields and model._fields[fname].column_type for fname in fnames):
+            # superseded by the index with the columns the other way around
+            model._cr.execute(SQL("DROP INDEX IF EXISTS %s", SQL.identifier(
+                '%s_%s_idx' % (model._table, '_'.join(reversed(fnames))))))
+            tools.create_index(
+                model._cr, '%s_%s_idx' % (model._table, '_'.join(fnames)),
+                model._table, ['"%s"' % fname for fname in fnames],
+            )
+
+
+class DashboardSnapshot(models.Model):
+    _name = 'assets.dashboard.snapshot'
+    _description = 'Assets Dashboard Snapshot'
+    _log_access = False
+
+    company_id = fields.Many2one('res.company', string="Company", index=True, ondelete='cascade')
+    department_id = fields.Many2one('hr.department', string="Department", index=True, ondelete='cascade')
+    metric = fields.Char(required=True)
+    value = fields.Float(default=0.0)
+    update_date = fields.Datetime(string="Last Update")
+    # bumped by every upsert of the row, see _get_version
+    version = fields.Integer(default=0)
+
+    # models feeding the snapshot, see assets.dashboard.snapshot.mixin
+    SOURCE_MODELS = (
+        'asset.allocation.request',
+        'it.asset.allocation',
+        'it.asset.checklist',
+        'tools.asset.checklist',
+        'camp.asset.checklist',
+        'camp.room',
+    )
+
+    def init(self):
+        # company_id and department_id are NULL for source records without
+        # one, which would defeat a plain unique constraint
+        self._cr.execute("DROP INDEX IF EXISTS assets_dashboard_snapshot_company_metric_uniq")
+        tools.create_unique_index(
+            self._cr, 'assets_dashboard_snapshot_scope_metric_uniq', self._table,
+            ['COALESCE(company_id, 0)', 'COALESCE(department_id, 0)', 'metric'],
+        )
+
+    @api.model
+    def _apply_delta(self, deltas):
+        """ Add ``deltas`` (``{(company_id, department_id, metric): value}``)
+        to the snapshot in a single upsert, and queue them for the open
+        dashboards.
+        """
+        deltas = {key: value for key, value in deltas.items() if value}
+        if not deltas:
+            return
+        rows = [
+            SQL("(%s, %s, %s, %s, NOW() AT TIME ZONE 'UTC', 1)",
+                company_id or None, department_id or None, metric, value)
+            for (company_id, department_id, metric), value in deltas.items()
+        ]
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO %(table)s (company_id, department_id, metric, value, update_date, version)
+            VALUES %(rows)s
+            ON CONFLICT ((COALESCE(company_id, 0)), (COALESCE(department_id, 0)), metric)
+            DO UPDATE SET value = %(table)s.value + EXCLUDED.value,
+                          update_date = EXCLUDED.update_date,
+                          version = %(table)s.version + 1
+            """,
+            table=SQL.identifier(self._table),
+            rows=SQL(", ").join(rows),
+        ))
+        self.invalidate_model(['value', 'update_date', 'version'])
+        self._queue_notification(deltas)
+
+    @api.model
+    def _bus_channel(self, company_id, department_id):
+        """ Bus channel of the deltas of ``department_id`` in ``company_id``,
+        0 standing for the records without company or department.
+        """
+        return '%s%s_%s' % (BUS_CHANNEL_PREFIX, company_id or 0, department_id or 0)
+
+    @api.model
+    def _parse_bus_channel(self, channel):
+        """ Return the ``(company_id, department_id)`` of a channel of
+        :meth:`_bus_channel`, or ``None`` if it isn't one.
+        """
+        if not isinstance(channel, str) or not channel.startswith(BUS_CHANNEL_PREFIX):
+            return None
+        try:
+            company_id, department_id = map(int, channel[len(BUS_CHANNEL_PREFIX):].split('_'))
+        except ValueError:
+            return None
+        return company_id, department_id
+
+    @api.model
+    def _queue_notification(self, deltas):
+        # coalesce all the deltas of the transaction into one bus message
+        # per company and department, sent right before commit
+        data = self.env.cr.precommit.data
+        if NOTIFICATION_KEY not in data:
+            data[NOTIFICATION_KEY] = defaultdict(float)
+            self.env.cr.precommit.add(self._send_notifications)
+        pending = data[NOTIFICATION_KEY]
+        for key, value in deltas.items():
+            pending[key] += value
+
+    @api.model
+    def _send_notifications(self):
+        # each department's deltas only go to the channel of that department
+        pending = self.env.cr.precommit.data.pop(NOTIFICATION_KEY, {})
+        messages = defaultdict(dict)
+        for (company_id, department_id, metric), value in pending.items():
+            if value:
+                messages[(company_id or False, department_id or False)][metric] = value
+        self.env['bus.bus']._sendmany([
+            (self._bus_channel(company_id, department_id), 'assets_dashboard/delta', {
+                'department_id': department_id,
+                'deltas': metric_deltas,
+            })
+            for (company_id, department_id), metric_deltas in messages.items()
+        ])
+
+    @api.model
+    def action_reconcile(self):
+        """ Bring the snapshot back in line with the source tables, correcting
+        any drift left by writes that bypassed the ORM hooks (SQL updates,
+        stored computed fields, ...). Only the differences are written, and
+        published like any other delta.
+        """
+        values = defaultdict(float)
+        counter = self.env['assets.dashboard.status'].sudo()
+        for model_name, company_id, department_id, status, count in counter._read_status_counts(group_scope=True):
+            values[(company_id or False, department_id or False, '%s:%s' % (model_name, status))] += count
+        for model_name in self.SOURCE_MODELS:
+            for key, value in self.env[model_name].sudo()._dashboard_snapshot_sums().items():
+                values[key] += value
+        self.env.cr.execute(SQL(
+            "SELECT company_id, department_id, metric, value FROM %s FOR UPDATE",
+            SQL.identifier(self._table),
+        ))
+        for company_id, department_id, metric, value in self.env.cr.fetchall():
+            values[(company_id or False, department_id or False, metric)] -= value
+        self._apply_delta(values)
+        return True
+
+    @api.model
+    def _get_values(self, companies=None, department=None):
+        """ Return ``{metric: value}`` summed over ``companies`` (the current
+        companies by default), including the records that are not bound to a
+        company.
+
+        Without ``department`` the per-department partial aggregates are
+        summed up; with it, only that department's aggregates are read.
+
+        The snapshot is kept regardless of access rights: it only honours the
+        company scope, see :meth:`assets.dashboard._snapshot_counts` for the
+        other record rules.
+        """
+        companies = companies or self.env.companies
+        self.env.cr.execute(SQL(
+            """
+            SELECT metric, SUM(value)
+              FROM %s
+             WHERE (company_id = ANY(%s) OR company_id IS NULL)
+               %s
+          GROUP BY metric
+            """,
+            SQL.identifier(self._table), companies.ids,
+            SQL("AND department_id = %s", department.id) if department else SQL(),
+        ))
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _get_version(self, companies=None):
+        """ Return a value that changes whenever the snapshot of ``companies``
+        (the current companies by default) changes.
+
+        Every upsert increments the version of its rows, so their sum grows
+        with each committed change whatever the order in which concurrent
+        transactions commit, unlike the latest ``update_date``, which is
+        the start of the transaction.
+        """
+        companies = companies or self.env.companies
+        self.env.cr.execute(SQL(
+            "SELECT SUM(version), COUNT(*) FROM %s WHERE company_id = ANY(%s) OR company_id IS NULL",
+            SQL.identifier(self._table), companies.ids,
+        ))
+        version, count = self.env.cr.fetchone()
+        return '%s/%s' % (version or 0, count)
+
+    @api.model
+    def get_status_counts(self, companies=None, department=None):
+        """ Return ``{model: {status: count}}`` from the snapshot. """
+        counts = defaultdict(dict)
+        for metric, value in self._get_values(companies, department).items():
+            model_name, key = metric.split(':', 1)
+            counts[model_name][key] = int(value)
+        return counts
+
+
+class DashboardSnapshotMixin(models.AbstractModel):
+    """ Keep ``assets.dashboard.snapshot`` up to date with the records of the
+    inheriting model: every create, write and unlink applies its delta to
+    the snapshot instead of having the dashboard count the whole table.
+    """
+    _name = 'assets.dashboard.snapshot.mixin'
+    _description = 'Assets Dashboard Snapshot Mixin'
+
+    # field counted per value, e.g. 'state'
+    _dashboard_status_field = None
+    # numeric fields summed per company and department, e.g. ('capacity',)
+    _dashboard_sum_fields = ()
+    # hr.department field used to scope the dashboard of department users
+    _dashboard_department_field = 'department_id'
+    # composite indexes backing the dashboard filters, e.g. [('state', 'allocation_date')]
+    _dashboard_indexes = ()
+
+    def init(self):
+        super().init()
+        create_dashboard_indexes(self)
+
+    def _dashboard_sum_field_names(self):
+        return [fname for fname in self._dashboard_sum_fields if fname in self._fields]
+
+    def _dashboard_department_field_name(self):
+        field = self._fields.get(self._dashboard_department_field or '')
+        if field and field.type == 'many2one' and field.comodel_name == 'hr.department' and field.store:
+            return field.name
+        return None
+
+    def _dashboard_snapshot_fields(self):
+        fnames = ['company_id'] if 'company_id' in self._fields else []
+        if 'active' in self._fields:
+            # archiving and restoring move the record out of and into the counts
+            fnames.append('active')
+        if self._dashboard_department_field_name():
+            fnames.append(self._dashboard_department_field_name())
+        if self._dashboard_status_field:
+            fnames.append(self._dashboard_status_field)
+        return fnames + self._dashboard_sum_field_names()
+
+    def _dashboard_snapshot_values(self):
+        """ Return the contribution of ``self`` to the snapshot as
+        ``{(company_id, department_id, metric): value}``. Archived records
+        don't contribute, as the reconcile of the snapshot doesn't count them
+        either.
+        """
+        values = defaultdict(float)
+        has_company = 'company_id' in self._fields
+        department_field = self._dashboard_department_field_name()
+        status_field = self._dashboard_status_field
+        sum_fields = self._dashboard_sum_field_names()
+        for record in self:
+            if 'active' in self._fields and not record.active:
+                continue
+            company_id = record.company_id.id if has_company else False
+            department_id = record[department_field].id if department_field else False
+            if status_field and record[status_field]:
+                values[(company_id, department_id, '%s:%s' % (self._name, record[status_field]))] += 1
+            for fname in sum_fields:
+                values[(company_id, department_id, '%s:%s' % (self._name, fname))] += record[fname] or 0
+        return values
+
+    @api.model
+    def _dashboard_snapshot_sums(self):
+        """ Sum fields of :meth:`_dashboard_snapshot_values` over the whole
+        table, computed with one grouped query. Status counts are computed
+        for all models at once by ``assets.dashboard.status``.
+        """
+        values = defaultdict(float)
+        sum_fields = self._dashboard_sum_field_names()
+        if not sum_fields:
+            return values
+        has_company = 'company_id' in self._fields
+        department_field = self._dashboard_department_field_name()
+        groupby = (['company_id'] if has_company else []) + ([department_field] if department_field else [])
+        aggregates = ['%s:sum' % fname for fname in sum_fields]
+        for row in self._read_group([], groupby, aggregates):
+            groups = list(row[:len(groupby)])
+            company_id = groups.pop(0).id if has_company else False
+            department_id = groups.pop(0).id if department_field else False
+            for fname, value in zip(sum_fields, row[len(groupby):]):
+                values[(company_id, department_id, '%s:%s' % (self._name, fname))] += value or 0
+        return values
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['assets.dashboard.snapshot']._apply_delta(records._dashboard_snapshot_values())
+        return records
+
+    def write(self, vals):
+        if not set(vals) & set(self._dashboard_snapshot_fields()):
+            return super().write(vals)
+        deltas = self._dashboard_snapshot_values()
+        for key in deltas:
+            deltas[key] = -deltas[key]
+        res = super().write(vals)
+        for key, value in self._dashboard_snapshot_values().items():
+            deltas[key] += value
+        self.env['assets.dashboard.snapshot']._apply_delta(deltas)
+        return res
+
+    def unlink(self):
+        deltas = {key: -value for key, value in self._dashboard_snapshot_values().items()}
+        res = super().unlink()
+        self.env['assets.dashboard.snapshot']._apply_delta(deltas)
+        return res
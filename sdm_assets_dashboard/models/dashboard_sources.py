@@ -0,0 +1,53 @@
+from odoo import models
+
+from .dashboard_snapshot import create_dashboard_indexes
+
+
+class AssetAllocationRequest(models.Model):
+    _name = 'asset.allocation.request'
+    _inherit = ['asset.allocation.request', 'assets.dashboard.snapshot.mixin']
+    _dashboard_status_field = 'state'
+    _dashboard_indexes = [('state', 'create_date')]
+
+
+class ItAssetAllocation(models.Model):
+    _name = 'it.asset.allocation'
+    _inherit = ['it.asset.allocation', 'assets.dashboard.snapshot.mixin']
+    _dashboard_status_field = 'state'
+    _dashboard_indexes = [('state', 'allocation_date'), ('state', 'create_date')]
+
+
+class ItAssetChecklist(models.Model):
+    _name = 'it.asset.checklist'
+    _inherit = ['it.asset.checklist', 'assets.dashboard.snapshot.mixin']
+    _dashboard_status_field = 'status'
+    _dashboard_indexes = [('status', 'create_date')]
+
+
+class ToolsAssetChecklist(models.Model):
+    _name = 'tools.asset.checklist'
+    _inherit = ['tools.asset.checklist', 'assets.dashboard.snapshot.mixin']
+    _dashboard_status_field = 'status'
+    _dashboard_indexes = [('status', 'create_date')]
+
+
+class CampAssetChecklist(models.Model):
+    _name = 'camp.asset.checklist'
+    _inherit = ['camp.asset.checklist', 'assets.dashboard.snapshot.mixin']
+    _dashboard_status_field = 'status'
+    _dashboard_indexes = [('status', 'create_date')]
+
+
+class CampRoom(models.Model):
+    _name = 'camp.room'
+    _inherit = ['camp.room', 'assets.dashboard.snapshot.mixin']
+    # vacant_slots is left out: stored computes are written without write()
+    _dashboard_sum_fields = ('capacity',)
+
+
+class ToolsEquipmentAllocation(models.Model):
+    _inherit = 'tools.equipment.allocation'
+
+    def init(self):
+        super().init()
+        create_dashboard_indexes(self, [('state', 'allocation_date')])
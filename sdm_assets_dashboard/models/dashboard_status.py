@@ -0,0 +1,68 @@
+from collections import defaultdict
+
+from odoo import models, api
+from odoo.tools import SQL
+
+
+class DashboardStatusCounter(models.AbstractModel):
+    _name = 'assets.dashboard.status'
+    _description = 'Assets Dashboard Status Counter'
+
+    @api.model
+    def _status_models(self):
+        """ Return ``{model: status field}`` for every snapshot source that
+        counts its records per status.
+        """
+        sources = {}
+        for model_name in self.env['assets.dashboard.snapshot'].SOURCE_MODELS:
+            status_field = self.env[model_name]._dashboard_status_field
+            if status_field:
+                sources[model_name] = status_field
+        return sources
+
+    @api.model
+    def _read_status_counts(self, model_names=None, group_scope=False):
+        """ Count the records of all ``model_names`` per status with a single
+        ``UNION ALL`` query, honouring the access rules of the current user.
+
+        :param group_scope: also split the counts per company and department
+        :return: list of ``(model, company_id, department_id, status, count)``
+        """
+        sources = self._status_models()
+        if model_names is not None:
+            sources = {name: sources[name] for name in model_names}
+        selects = []
+        for model_name, status_field in sources.items():
+            model = self.env[model_name]
+            query = model._search([])
+            query.order = None
+            status = SQL.identifier(model._table, status_field)
+            groupby = [status]
+            company = department = SQL("NULL::int")
+            department_field = model._dashboard_department_field_name()
+            if group_scope and 'company_id' in model._fields:
+                company = SQL.identifier(model._table, 'company_id')
+                groupby.append(company)
+            if group_scope and department_field:
+                department = SQL.identifier(model._table, department_field)
+                groupby.append(department)
+            query.groupby = SQL(", ").join(groupby)
+            selects.append(SQL("(%s)", query.select(
+                SQL("%s", model_name), company, department, status, SQL("COUNT(*)"),
+            )))
+        if not selects:
+            return []
+        self.env.cr.execute(SQL(" UNION ALL ").join(selects))
+        return [row for row in self.env.cr.fetchall() if row[3]]
+
+    @api.model
+    def get_status_counts(self, model_names=None):
+        """ Return ``{model: {status: count}}`` for all status-tracked
+        dashboard models (or only ``model_names``) in one round-trip.
+        """
+        counts = defaultdict(dict)
+        for model_name in model_names or self._status_models():
+            counts[model_name] = {}
+        for model_name, _company_id, _department_id, status, count in self._read_status_counts(model_names):
+            counts[model_name][status] = count
+        return counts
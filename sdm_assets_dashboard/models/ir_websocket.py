@@ -0,0 +1,16 @@
+from odoo import models
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        # the dashboard channels come from the client: drop the ones of the
+        # companies and departments the user isn't allowed to see
+        snapshot = self.env['assets.dashboard.snapshot']
+        channels = [
+            channel for channel in channels
+            if snapshot._parse_bus_channel(channel) is None
+            or self.env['assets.dashboard']._check_bus_channel(channel)
+        ]
+        return super()._build_bus_channel_list(channels)
@@ -2,12 +2,35 @@
 
 import { registry } from "@web/core/registry";
 import { useService } from "@web/core/utils/hooks";
-import { Component, onWillStart, onMounted, useState, useRef } from "@odoo/owl";
-
+import { Component, onWillStart, onMounted, onWillUnmount, useState, useRef } from "@odoo/owl";
+
+
+// snapshot model: [state key of its status graph, widget showing it]
+const SNAPSHOT_GRAPHS = {
+    "it.asset.allocation": ["allocation_graph", "allocations"],
+    "it.asset.checklist": ["checklist_graph", "checklists"],
+    "tools.asset.checklist": ["tools_checklist_graph", "tools_checklists"],
+    "camp.asset.checklist": ["camp_checklist_graph", "camp_checklists"],
+    "asset.allocation.request": ["department_allocation", "department_requests"],
+};
+// time series are downsampled server side beyond this number of points
+const MAX_CHART_POINTS = 120;
+
+// {labels: [...], values: [...]} -> {label: value}
+function fromColumns(columns) {
+    const series = {};
+    (columns.labels || []).forEach((label, index) => {
+        series[label] = columns.values[index];
+    });
+    return series;
+}
 
 class AssetsDashboard extends Component {
     setup() {
         this.orm = useService("orm");
+        this.user = useService("user");
+        this.busService = useService("bus_service");
+        this.onSnapshotDelta = this.onSnapshotDelta.bind(this);
 
         this.state = useState({
             total_vacant_slots: 0,
@@ -23,15 +46,20 @@ class AssetsDashboard extends Component {
             checklist_graph: {},
             tools_checklist_graph: {},
             camp_checklist_graph: {},
-            last_30_days_data: {},
-            last_30_days_checklist_data:{},
+            last_30_days_data: { labels: [], values: [] },
+            last_30_days_checklist_data: { labels: [], values: [] },
+            history_days: 30,
             allocated_vs_vacant_data:{},
             department_allocation:{},
             camp_data:{},
+            camp_offset: 0,
+            camp_total: 0,
+            camp_page_size: 20,
             groupInfo: {
                 is_manager: false,
                 is_department: false,
             },
+            loaded: {},
 //            tools_allocation_graph:{},
 
 
@@ -46,60 +74,174 @@ class AssetsDashboard extends Component {
         this.checklistChartCanvasRef = useRef("checklistLine"); //  Line chart canvas
         this.vacancyCanvasRef = useRef("totalrooms"); //  Line chart canvas
         this.campVacancyCanvasRef = useRef("campvacancies"); //  Line chart canvas
+        this.historyWindows = [7, 30, 90, 365];
+        this.charts = {};
 
 
 
 
         onWillStart(async () => {
-            const result = await this.orm.call("assets.dashboard", "get_tiles_data", [], {});
-            this.state.total_vacant_slots= result.total_vacant_slots;
-            this.state.today_allocations = result.today_allocations;
-            this.state.today_tools_allocations = result.today_tools_allocations;
-            this.state.total = result.total;
-            this.state.allocated = result.allocated;
-            this.state.returned = result.returned;
-            this.state.draft = result.draft;
-
-            this.state.allocation_graph = result.graph_data || {};
-            this.state.checklist_graph = result.check_list_graph_data || {};
-            this.state.tools_checklist_graph = result.tools_check_list_graph_data || {};
-            this.state.camp_checklist_graph = result.camp_checklist_graph_data || {};
-            this.state.last_30_days_data = result.last_30_days_data || {};
-            this.state.last_30_days_checklist_data = result.last_30_days_checklist_data || {};
-            this.state.allocated_vs_vacant_data = result.allocated_vs_vacant_data || {};
-            this.state.stacked_bar_data = result.stacked_bar_data || {};
-            this.state.department_allocation = result.department_allocated_graph_data || {};
-
-
+            // the group flags decide which canvases exist, everything else
+            // is loaded widget by widget once the dashboard is displayed
             const groupInfo = await this.orm.call("assets.dashboard", "get_user_group_info", [], {});
             this.state.groupInfo = groupInfo;
-
-
-
-
-
-
+            this.busChannels = groupInfo.bus_channels || [];
+            this.scopeDepartmentId = groupInfo.scope_department_id;
         });
 
         onMounted(() => {
-            this.renderAllocationChart();
-            this.renderChecklistChart();
-            this.renderToolChecklistChart();
-            this.renderDepartmentAllocationChart();
-            this.renderCampChecklistChart();
-            this.renderLast30DaysChart();
-            this.renderChecklistLast30DaysChart();
-            this.renderVacancyChart();
-            this.renderCampVacancy();
-
+            // counters are then kept up to date by the deltas pushed on the bus
+            this.busService.subscribe("assets_dashboard/delta", this.onSnapshotDelta);
+            for (const channel of this.busChannels) {
+                this.busService.addChannel(channel);
+            }
+            for (const widget of Object.keys(this.widgets)) {
+                this.loadWidget(widget);
+            }
+        });
 
+        onWillUnmount(() => {
+            this.busService.unsubscribe("assets_dashboard/delta", this.onSnapshotDelta);
+            for (const channel of this.busChannels) {
+                this.busService.deleteChannel(channel);
+            }
+            for (const chart of Object.values(this.charts)) {
+                chart.destroy();
+            }
         });
     }
+    get widgets() {
+        // widget name: [apply the RPC result to the state, render its charts]
+        return {
+            rooms: [(result) => {
+                this.state.total_vacant_slots = result.total_vacant_slots;
+                this.state.allocated_vs_vacant_data = result.allocated_vs_vacant_data || {};
+            }, () => this.renderVacancyChart()],
+            today: [(result) => {
+                this.state.today_allocations = result.today_allocations;
+                this.state.today_tools_allocations = result.today_tools_allocations;
+            }, () => {}],
+            allocations: [(result) => {
+                this.state.total = result.total;
+                this.state.allocated = result.allocated;
+                this.state.returned = result.returned;
+                this.state.draft = result.draft;
+                this.state.allocation_graph = fromColumns(result.graph_data || {});
+            }, () => this.renderAllocationChart()],
+            checklists: [(result) => {
+                this.state.checklist_graph = fromColumns(result.check_list_graph_data || {});
+            }, () => this.renderChecklistChart()],
+            tools_checklists: [(result) => {
+                this.state.tools_checklist_graph = fromColumns(result.tools_check_list_graph_data || {});
+            }, () => this.renderToolChecklistChart()],
+            camp_checklists: [(result) => {
+                this.state.camp_checklist_graph = fromColumns(result.camp_checklist_graph_data || {});
+            }, () => this.renderCampChecklistChart()],
+            department_requests: [(result) => {
+                this.state.department_allocation = fromColumns(result.department_allocated_graph_data || {});
+            }, () => this.renderDepartmentAllocationChart()],
+            history: [(result) => {
+                this.state.history_days = result.history_days;
+                this.state.last_30_days_data = result.last_30_days_data;
+                this.state.last_30_days_checklist_data = result.last_30_days_checklist_data;
+            }, () => {
+                this.renderLast30DaysChart();
+                this.renderChecklistLast30DaysChart();
+            }],
+            camp_occupancy: [(result) => {
+                this.state.stacked_bar_data = result.stacked_bar_data;
+                this.state.camp_total = result.camp_total || 0;
+                this.state.camp_offset = result.camp_offset || 0;
+                this.state.camp_page_size = result.camp_page_size || 20;
+            }, () => this.renderCampVacancy()],
+        };
+    }
+    async fetchWidget(widget, params) {
+        // plain GET so that the browser revalidates its copy with the ETag
+        // and unchanged widgets cost a 304 instead of a full payload
+        const query = new URLSearchParams({
+            ...params,
+            cids: (this.user.context.allowed_company_ids || []).join(","),
+            max_points: MAX_CHART_POINTS,
+        });
+        const response = await fetch(`/assets_dashboard/widget/${widget}?${query}`, {
+            credentials: "same-origin",
+            headers: { Accept: "application/json" },
+        });
+        if (!response.ok) {
+            throw new Error(`Could not load the ${widget} dashboard widget (${response.status})`);
+        }
+        return response.json();
+    }
+    async loadWidget(widget, params = {}) {
+        const [apply, render] = this.widgets[widget];
+        const result = await this.fetchWidget(widget, params);
+        apply(result);
+        this.state.loaded[widget] = true;
+        render();
+    }
+    onSnapshotDelta({ department_id, deltas }) {
+        if (this.scopeDepartmentId !== false && department_id !== this.scopeDepartmentId) {
+            // department dashboards only follow their own partial aggregates
+            return;
+        }
+        const touched = new Set();
+        let reloadRooms = false;
+        for (const [metric, delta] of Object.entries(deltas)) {
+            const index = metric.indexOf(":");
+            const model = metric.slice(0, index);
+            const key = metric.slice(index + 1);
+            if (model === "camp.room") {
+                // the vacant slots are computed by the server, not pushed
+                reloadRooms = reloadRooms || this.state.loaded.rooms;
+            } else if (model in SNAPSHOT_GRAPHS) {
+                const [stateKey, widget] = SNAPSHOT_GRAPHS[model];
+                if (!this.state.loaded[widget]) continue;
+                const graph = this.state[stateKey];
+                graph[key] = (graph[key] || 0) + delta;
+                touched.add(widget);
+            }
+        }
+        if (touched.has("allocations")) {
+            const graph = this.state.allocation_graph;
+            this.state.total = Object.values(graph).reduce((sum, count) => sum + count, 0);
+            this.state.allocated = graph.allocated || 0;
+            this.state.returned = graph.returned || 0;
+            this.state.draft = graph.draft || 0;
+        }
+        for (const widget of touched) {
+            this.widgets[widget][1]();
+        }
+        if (reloadRooms) {
+            this.loadWidget("rooms");
+        }
+    }
+    drawChart(key, canvas, config) {
+        const chart = this.charts[key];
+        if (chart && chart.canvas === canvas && chart.config.type === config.type) {
+            // patch the existing chart rather than rebuilding it
+            chart.data = config.data;
+            chart.update();
+            return;
+        }
+        if (chart) {
+            chart.destroy();
+        }
+        this.charts[key] = new Chart(canvas, config);
+    }
+    async onHistoryDaysChange(ev) {
+        await this.loadWidget("history", { days: parseInt(ev.target.value) });
+    }
+    async onCampPage(step) {
+        const offset = this.state.camp_offset + step * this.state.camp_page_size;
+        if (offset < 0 || offset >= this.state.camp_total) return;
+        await this.loadWidget("camp_occupancy", { offset: offset, limit: this.state.camp_page_size });
+    }
     renderAllocationChart() {
         const canvas = this.allocationCanvasRef.el;
         if (!canvas) return;
 
-        new Chart(canvas, {
+        this.drawChart("allocations_bar", canvas, {
             type: 'bar',
             data: {
                 labels: Object.keys(this.state.allocation_graph),
@@ -126,7 +268,7 @@ class AssetsDashboard extends Component {
         const canvas = this.checklistCanvasRef.el;
         if (!canvas) return;
 
-        new Chart(canvas, {
+        this.drawChart("checklists_pie", canvas, {
             type: 'pie',
             data: {
                 labels: Object.keys(this.state.checklist_graph),
@@ -157,7 +299,7 @@ class AssetsDashboard extends Component {
         const canvas = this.toolCanvasRef.el;
         if (!canvas) return;
 
-        new Chart(canvas, {
+        this.drawChart("tools_checklists", canvas, {
             type: 'polarArea',
             data: {
                 labels: Object.keys(this.state.tools_checklist_graph),
@@ -189,7 +331,7 @@ class AssetsDashboard extends Component {
         const canvas = this.campCanvasRef.el;
         if (!canvas) return;
 
-        new Chart(canvas, {
+        this.drawChart("camp_checklists", canvas, {
             type: 'polarArea',
             data: {
                 labels: Object.keys(this.state.camp_checklist_graph),
@@ -220,13 +362,13 @@ class AssetsDashboard extends Component {
         const canvas = this.lineChartCanvasRef.el;
         if (!canvas) return;
 
-        new Chart(canvas, {
+        this.drawChart("history_allocations", canvas, {
             type: 'line',
             data: {
-                labels: Object.keys(this.state.last_30_days_data),
+                labels: this.state.last_30_days_data.labels,
                 datasets: [{
-                    label: 'Last 30 Days Asset Allocations',
-                    data: Object.values(this.state.last_30_days_data),
+                    label: `Last ${this.state.history_days} Days Asset Allocations`,
+                    data: this.state.last_30_days_data.values,
                     borderColor: '#36A2EB',
                     backgroundColor: 'rgba(54,162,235,0.2)',
                     tension: 0.3,
@@ -253,7 +395,7 @@ class AssetsDashboard extends Component {
         const canvas = this.departmentCanvasRef.el;
         if (!canvas) return;
 
-        new Chart(canvas, {
+        this.drawChart("department_requests", canvas, {
             type: 'pie',
             data: {
                 labels: Object.keys(this.state.department_allocation),
@@ -285,13 +427,13 @@ class AssetsDashboard extends Component {
         const canvas = this.checklistChartCanvasRef.el;
         if (!canvas) return;
 
-        new Chart(canvas, {
+        this.drawChart("history_checklists", canvas, {
             type: 'line',
             data: {
-                labels: Object.keys(this.state.last_30_days_checklist_data),
+                labels: this.state.last_30_days_checklist_data.labels,
                 datasets: [{
-                    label: 'Last 30 Days Asset Checklists',
-                    data: Object.values(this.state.last_30_days_checklist_data),
+                    label: `Last ${this.state.history_days} Days Asset Checklists`,
+                    data: this.state.last_30_days_checklist_data.values,
                     borderColor: '#36A2EB',
                     tension: 0.3,
                     pointRadius: 0,
@@ -314,7 +456,7 @@ class AssetsDashboard extends Component {
         const canvas = this.vacancyCanvasRef.el;
         if (!canvas) return;
 
-        new Chart(canvas, {
+        this.drawChart("rooms", canvas, {
             type: 'doughnut',
             data: {
 //        labels: ["Total Rooms","Vacant Rooms"],
@@ -345,19 +487,19 @@ class AssetsDashboard extends Component {
     const canvas = this.campVacancyCanvasRef.el;
     if (!canvas) return;
 
-    new Chart(canvas, {
+    this.drawChart("camp_occupancy", canvas, {
     type: 'bar',
     data: {
-        labels: ["CAMP 1", "CAMP 2", "CAMP 3", "Camp 4"],
+        labels: this.state.stacked_bar_data.labels,
         datasets: [
             {
                 label: 'Allocated',
-                data: Object.values(this.state.stacked_bar_data).map(v => v.allocated || 0),
+                data: this.state.stacked_bar_data.allocated || [],
                 backgroundColor: '#E74C3C'
             },
             {
                 label: 'Vacant',
-                data: Object.values(this.state.stacked_bar_data).map(v => v.vacant || 0),
+                data: this.state.stacked_bar_data.vacant || [],
                 backgroundColor: '#F39C12'
             }
         ]
@@ -0,0 +1,99 @@
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import SQL
+
+from odoo.addons.sdm_assets_dashboard.benchmark import dashboard_benchmark
+
+
+@tagged('post_install', '-at_install')
+class TestDashboardSnapshot(TransactionCase):
+    """ The deltas applied by the ORM hooks must agree with a reconcile of
+    the snapshot, which recounts the source tables.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Snapshot = cls.env['assets.dashboard.snapshot']
+        cls.Checklist = cls.env['it.asset.checklist']
+        cls.status, cls.other_status = cls.Checklist._fields['status'].get_values(cls.env)[:2]
+        # the required values of the source model, created once for the class
+        dashboard_benchmark._required_values_cache.clear()
+        dashboard_benchmark._required_values(cls.env, cls.Checklist)
+        cls.Snapshot.action_reconcile()
+
+    @classmethod
+    def tearDownClass(cls):
+        dashboard_benchmark._required_values_cache.clear()
+        super().tearDownClass()
+
+    def _create(self, count=1, status=None):
+        return self.Checklist.create([
+            dashboard_benchmark._fill_required(self.env, self.Checklist, {'status': status or self.status}, index)
+            for index in range(count)
+        ])
+
+    def _count(self, status=None):
+        return self.Snapshot._get_values().get('it.asset.checklist:%s' % (status or self.status), 0)
+
+    def assertReconciled(self):
+        values = self.Snapshot._get_values()
+        version = self.Snapshot._get_version()
+        self.Snapshot.action_reconcile()
+        self.assertEqual(self.Snapshot._get_values(), values, "the deltas should agree with a reconcile")
+        self.assertEqual(self.Snapshot._get_version(), version, "an agreeing reconcile should write nothing")
+
+    def test_create_write_unlink(self):
+        count, other_count = self._count(), self._count(self.other_status)
+        checklists = self._create(3)
+        self.assertEqual(self._count(), count + 3)
+        self.assertReconciled()
+
+        checklists[0].status = self.other_status
+        self.assertEqual(self._count(), count + 2)
+        self.assertEqual(self._count(self.other_status), other_count + 1)
+        self.assertReconciled()
+
+        checklists.unlink()
+        self.assertEqual(self._count(), count)
+        self.assertEqual(self._count(self.other_status), other_count)
+        self.assertReconciled()
+
+    def test_archive(self):
+        if 'active' not in self.Checklist._fields:
+            self.skipTest("it.asset.checklist cannot be archived")
+        count = self._count()
+        checklists = self._create(2)
+        checklists[0].active = False
+        self.assertEqual(self._count(), count + 1, "archived records should leave the counts")
+        self.assertReconciled()
+
+        checklists[0].active = True
+        self.assertEqual(self._count(), count + 2)
+        self.assertReconciled()
+
+    def test_reconcile_corrects_drift(self):
+        count, other_count = self._count(), self._count(self.other_status)
+        checklists = self._create(2)
+        # a write bypassing the ORM hooks
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "UPDATE %s SET status = %s WHERE id = ANY(%s)",
+            SQL.identifier(self.Checklist._table), self.other_status, checklists.ids,
+        ))
+        self.Checklist.invalidate_model(['status'])
+        self.assertEqual(self._count(), count + 2)
+
+        version = self.Snapshot._get_version()
+        self.Snapshot.action_reconcile()
+        self.assertEqual(self._count(), count)
+        self.assertEqual(self._count(self.other_status), other_count + 2)
+        self.assertNotEqual(self.Snapshot._get_version(), version, "a correcting reconcile should change the version")
+
+    def test_widget_counts(self):
+        dashboard = self.env['assets.dashboard']
+        checklists = dashboard._widget_checklists()['check_list_graph_data']
+        self._create(2)
+        self.assertEqual(
+            dashboard._widget_checklists()['check_list_graph_data'].get(self.status, 0),
+            checklists.get(self.status, 0) + 2,
+        )